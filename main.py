@@ -26,11 +26,20 @@ from apscheduler.schedulers.background import BackgroundScheduler
 from pyrogram import Client
 
 from plugins import glovar
-from plugins.functions.timers import backup_files, interval_hour_01, reset_count, update_status
+from plugins.functions.engine import get_measurer, get_pool, prefetch_patterns
+from plugins.functions.etc import thread
+from plugins.functions.file import save_dirty
+from plugins.functions.timers import backup_files, cluster_words, interval_hour_01, reset_count, update_status
 
 # Enable logging
 logger = logging.getLogger(__name__)
 
+# Start the processes before any thread is started
+glovar.measurer = get_measurer()
+
+if glovar.processes:
+    glovar.pool = get_pool(glovar.processes)
+
 # Config session
 app = Client(
     session_name="bot",
@@ -38,6 +47,9 @@ app = Client(
 )
 app.start()
 
+# Compile the patterns before the first messages need them
+thread(prefetch_patterns, ())
+
 # Send online status
 update_status(app, "online")
 
@@ -47,6 +59,7 @@ scheduler.add_job(interval_hour_01, "interval", [app], hours=1)
 scheduler.add_job(update_status, "cron", [app, "awake"], minute=randint(30, 34), second=randint(0, 59))
 scheduler.add_job(backup_files, "cron", [app], hour=20)
 scheduler.add_job(reset_count, "cron", [app], hour=20, minute=30)
+scheduler.add_job(cluster_words, "cron", [app], day_of_week="sun", hour=21)
 scheduler.start()
 
 # Hold
@@ -54,3 +67,6 @@ app.idle()
 
 # Stop
 app.stop()
+
+# Flush the files not saved yet
+save_dirty()
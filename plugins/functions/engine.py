@@ -0,0 +1,1677 @@
+# SCP-079-REGEX - Manage regex patterns
+# Copyright (C) 2019-2020 SCP-079 <https://scp-079.org>
+#
+# This file is part of SCP-079-REGEX.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import logging
+import re
+from bisect import bisect_right
+from functools import lru_cache
+from hashlib import md5
+from math import log2
+from multiprocessing import Pipe, TimeoutError, get_context
+from multiprocessing.connection import Connection
+from multiprocessing.pool import Pool
+from random import choice, sample
+from sys import maxunicode
+from time import perf_counter, time
+from typing import Dict, FrozenSet, List, Match, Optional, Pattern, Set, Tuple, Union
+
+from xeger import Xeger
+
+from .. import glovar
+from .file import journal
+from .workers import init_snapshots, search_words, serve_costs
+
+try:
+    from re import _parser as sre_parse
+except ImportError:
+    import sre_parse
+
+try:
+    import re2
+except ImportError:
+    re2 = None
+
+# Enable logging
+logger = logging.getLogger(__name__)
+
+# Xeger config
+xg = Xeger(limit=8)
+
+# Characters that the re module treats as the same one when ignoring case, but str.lower() does not
+folds = {
+    0x130: "i", 0x131: "i", 0x17f: "s", 0xb5: "\u03bc", 0x345: "\u03b9", 0x1fbe: "\u03b9",
+    0x1fd3: "\u0390", 0x1fe3: "\u03b0", 0x3d0: "\u03b2", 0x3f5: "\u03b5", 0x3d1: "\u03b8",
+    0x3f0: "\u03ba", 0x3d6: "\u03c0", 0x3f1: "\u03c1", 0x3c2: "\u03c3", 0x3d5: "\u03c6",
+    0x1c80: "\u0432", 0x1c81: "\u0434", 0x1c82: "\u043e", 0x1c83: "\u0441", 0x1c84: "\u0442",
+    0x1c85: "\u0442", 0x1c86: "\u044a", 0x1c87: "\u0463", 0xa64b: "\u1c88", 0x1e9b: "\u1e61",
+    0xfb05: "\ufb06"
+}
+
+
+def add_cache(key: Tuple[str, str, int], words: List[str]) -> bool:
+    # Add the words hit by a text to the result cache, drop the least recently used results
+    result = False
+    try:
+        if not glovar.limit_cache:
+            return False
+
+        with glovar.locks["cache"]:
+            glovar.cache[key] = words
+            glovar.cache.move_to_end(key)
+
+            while len(glovar.cache) > glovar.limit_cache:
+                glovar.cache.popitem(last=False)
+
+        result = True
+    except Exception as e:
+        logger.warning(f"Add cache error: {e}", exc_info=True)
+
+    return result
+
+
+def add_pattern(word_type: str, word: str) -> bool:
+    # Compile a word and add it to the pattern cache
+    try:
+        if word not in glovar.rule_types and glovar.trigrams is not None:
+            for trigram in get_trigrams(word):
+                glovar.trigrams.setdefault(trigram, set()).add(word)
+
+        glovar.rule_types.setdefault(word, set()).add(word_type)
+        glovar.compiled[word_type][word] = re.compile(word, re.I | re.M | re.S)
+        glovar.flags[word_type][word] = get_flags(word)
+        glovar.literals[word_type][word] = get_literals(word)
+        glovar.versions[word_type] += 1
+
+        return True
+    except Exception as e:
+        logger.warning(f"Add pattern error: {e}", exc_info=True)
+
+    return False
+
+
+def add_profile(word_type: str, word: str, cost: float) -> bool:
+    # Add the time of a search to the profile of a word
+    try:
+        if word not in glovar.compiled[word_type]:
+            return True
+
+        profile = glovar.profiles[word_type].setdefault(word, {"count": 0, "total": 0.0, "worst": 0.0})
+        profile["count"] += 1
+        profile["total"] += cost
+        profile["worst"] = max(profile["worst"], cost)
+
+        return True
+    except Exception as e:
+        logger.warning(f"Add profile error: {e}", exc_info=True)
+
+    return False
+
+
+def get_automaton(word_type: str) -> Dict[str, Union[int, list]]:
+    # Get the Aho-Corasick automaton of the required literals of a word type
+    result = {}
+    try:
+        version = glovar.versions[word_type]
+        result = glovar.automatons.get(word_type, {})
+
+        if result and result["version"] == version:
+            return result
+
+        goto = [{}]
+        fail = [0]
+        link = [0]
+        output = [[]]
+        always = []
+        literals = glovar.literals[word_type]
+
+        for word in list(glovar.compiled[word_type]):
+            if word not in literals:
+                literals[word] = get_literals(word)
+
+            if not literals[word]:
+                always.append(word)
+                continue
+
+            for literal in literals[word]:
+                state = 0
+
+                for c in literal:
+                    if c not in goto[state]:
+                        goto[state][c] = len(goto)
+                        goto.append({})
+                        fail.append(0)
+                        link.append(0)
+                        output.append([])
+
+                    state = goto[state][c]
+
+                output[state].append(word)
+
+        # Breadth-first, so the failure state is always ready before its children
+        queue = list(goto[0].values())
+
+        for state in queue:
+            for c, child in goto[state].items():
+                queue.append(child)
+                f = fail[state]
+
+                while f and c not in goto[f]:
+                    f = fail[f]
+
+                fail[child] = goto[f].get(c, 0) if state else 0
+                link[child] = fail[child] if output[fail[child]] else link[fail[child]]
+
+        result = {
+            "version": version,
+            "goto": goto,
+            "fail": fail,
+            "link": link,
+            "output": output,
+            "always": always
+        }
+        glovar.automatons[word_type] = result
+    except Exception as e:
+        logger.warning(f"Get automaton error: {e}", exc_info=True)
+
+    return result
+
+
+def get_bank(word: str, limit: int = 3) -> List[str]:
+    # Get the generated sample texts of a word, return an empty list if the word cannot generate them
+    result = []
+    try:
+        result = [xg.xeger(word) for _ in range(limit)]
+    except Exception as e:
+        logger.info(f"Get bank of {word} error: {e}")
+        result = []
+
+    return result
+
+
+def get_benchmark(word_type: str, texts: List[str]) -> Dict[str, Union[float, int]]:
+    # Compare the backends with the words of a word type that both of them can run
+    result = {}
+    try:
+        combined = get_combined(word_type)
+        result = {
+            "re": len(combined["fallback"]),
+            "re2": len(combined["words"]),
+            "re_time": 0.0,
+            "re2_time": 0.0,
+            "mismatches": 0
+        }
+
+        for word in combined["words"]:
+            pattern = get_compiled(word_type, word)
+            linear = get_linear_pattern(glovar.linear[word_type].get(word, ""))
+
+            if not pattern or not linear:
+                continue
+
+            for text in texts:
+                start = perf_counter()
+                hit = bool(pattern.search(text))
+                middle = perf_counter()
+                linear_hit = bool(linear.search(text))
+                end = perf_counter()
+
+                result["re_time"] += middle - start
+                result["re2_time"] += end - middle
+                result["mismatches"] += hit != linear_hit
+    except Exception as e:
+        logger.warning(f"Get benchmark error: {e}", exc_info=True)
+
+    return result
+
+
+def get_cache(key: Tuple[str, str, int]) -> Optional[List[str]]:
+    # Get the cached words hit by a text
+    result = None
+    try:
+        if not glovar.limit_cache:
+            return None
+
+        with glovar.locks["cache"]:
+            result = glovar.cache.get(key)
+
+            if result is None:
+                glovar.cache_stats["misses"] += 1
+            else:
+                glovar.cache.move_to_end(key)
+                glovar.cache_stats["hits"] += 1
+    except Exception as e:
+        logger.warning(f"Get cache error: {e}", exc_info=True)
+
+    return result
+
+
+def get_cache_key(word_type: str, text: str) -> Tuple[str, str, int]:
+    # Get the result cache key of a text, the words are only searched in its normalized variants
+    result = (word_type, "", 0)
+    try:
+        normalized = get_variants(text)[0] if text else ""
+        result = (word_type, md5(normalized.encode("utf-8")).hexdigest(), glovar.versions[word_type])
+    except Exception as e:
+        logger.warning(f"Get cache key error: {e}", exc_info=True)
+
+    return result
+
+
+def get_candidates(word_type: str, text: str) -> Optional[Set[str]]:
+    # Get the words whose required literals can be found in the text
+    result = None
+    try:
+        automaton = get_automaton(word_type)
+        goto = automaton["goto"]
+        fail = automaton["fail"]
+        link = automaton["link"]
+        output = automaton["output"]
+
+        result = set(automaton["always"])
+        seen = set()
+        state = 0
+
+        for c in get_folded(text):
+            while state and c not in goto[state]:
+                state = fail[state]
+
+            state = goto[state].get(c, 0)
+            s = state
+
+            while s and s not in seen:
+                seen.add(s)
+                result.update(output[s])
+                s = link[s]
+    except Exception as e:
+        logger.warning(f"Get candidates error: {e}", exc_info=True)
+        result = None
+
+    return result
+
+
+def get_class(items: list) -> Tuple[bool, List[Tuple[int, int]]]:
+    # Get whether a parsed character class is negated and the code point intervals of its items
+    negate = False
+    intervals = []
+
+    for op, av in items:
+        if op is sre_parse.NEGATE:
+            negate = True
+        elif op is sre_parse.LITERAL:
+            intervals.append((av, av))
+        elif op is sre_parse.RANGE:
+            intervals.append(av)
+        elif op is sre_parse.CATEGORY:
+            name = str(av).lower().replace("category_", "")
+            category = name.replace("not_", "")
+
+            if category not in {"digit", "space", "word"}:
+                raise ValueError(f"Unsupported category {av}")
+
+            if name.startswith("not_"):
+                intervals += get_complement(get_intervals(category))
+            else:
+                intervals += get_intervals(category)
+        else:
+            raise ValueError(f"Unsupported class item {op}")
+
+    return negate, intervals
+
+
+def get_closure(nfa: Dict[str, Union[int, list]], states: Set[int]) -> FrozenSet[int]:
+    # Get the states of an automaton that can be reached from the states without consuming characters
+    result = set(states)
+    stack = list(states)
+
+    while stack:
+        for state in nfa["eps"][stack.pop()]:
+            if state not in result:
+                result.add(state)
+                stack.append(state)
+
+    return frozenset(result)
+
+
+def get_combined(word_type: str) -> Dict[str, Union[int, object, List[str]]]:
+    # Get the combined pattern set of a word type
+    result = {}
+    try:
+        version = glovar.versions[word_type]
+        result = glovar.combined.get(word_type, {})
+
+        if result and result["version"] == version:
+            return result
+
+        result = {}
+
+        pattern = None
+        words = []
+        fallback = list(glovar.compiled[word_type])
+
+        if re2 and fallback:
+            # Large Unicode classes need more memory than the default of the linear-time engine
+            options = re2.Options()
+            options.max_mem = 64 << 20
+            pattern = re2.Set.SearchSet(options)
+
+            for word in fallback:
+                if word not in glovar.linear[word_type]:
+                    glovar.linear[word_type][word] = get_linear(word)
+
+                linear = glovar.linear[word_type][word]
+
+                if not linear:
+                    continue
+
+                try:
+                    pattern.Add(linear)
+                    words.append(word)
+                except Exception as e:
+                    logger.info(f"Add {word} to the combined pattern error: {e}")
+
+            try:
+                words and pattern.Compile()
+            except Exception as e:
+                logger.warning(f"Compile the combined pattern of {word_type} error: {e}")
+                words = []
+
+            # Every word is searched by the re module if the set is empty or can not be compiled
+            if words:
+                word_set = set(words)
+                fallback = [w for w in fallback if w not in word_set]
+            else:
+                pattern = None
+
+        # Record the backend of each word
+        glovar.backends[word_type] = {w: "re" for w in fallback}
+        glovar.backends[word_type].update({w: "re2" for w in words})
+
+        result = {
+            "version": version,
+            "pattern": pattern,
+            "words": words,
+            "fallback": fallback,
+            "ocr_fallback": [w for w in fallback if not get_word_flags(word_type, w) & glovar.bits["nocr"]]
+        }
+        glovar.combined[word_type] = result
+    except Exception as e:
+        logger.warning(f"Get combined error: {e}", exc_info=True)
+
+    return result
+
+
+def get_combined_words(word_type: str, texts: List[str]) -> Optional[List[str]]:
+    # Get the words in the combined pattern set that any of the texts hits, they are confirmed by the re module later
+    result = None
+    try:
+        combined = get_combined(word_type)
+
+        if not combined["pattern"]:
+            return []
+
+        words = combined["words"]
+        hits = set()
+
+        for text in texts:
+            hits.update(combined["pattern"].Match(text) or [])
+
+        result = [words[i] for i in sorted(hits)]
+    except Exception as e:
+        logger.warning(f"Get combined words error: {e}", exc_info=True)
+        result = None
+
+    return result
+
+
+def get_compiled(word_type: str, word: str) -> Optional[Pattern]:
+    # Get the compiled pattern of a word of a type, compile it on first use
+    result = None
+    try:
+        result = glovar.compiled[word_type].get(word)
+
+        if result or word not in glovar.compiled[word_type]:
+            return result
+
+        result = re.compile(word, re.I | re.M | re.S)
+        glovar.compiled[word_type][word] = result
+    except Exception as e:
+        # Leave out the word that can not be compiled, as the startup did before
+        glovar.compiled.get(word_type, {}).pop(word, None)
+        logger.warning(f"Get compiled error: {e}", exc_info=True)
+
+    return result
+
+
+def get_complement(intervals: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    # Get the code point intervals that are not in the intervals
+    result = []
+    start = 0
+
+    for lo, hi in sorted(intervals):
+        if start < lo:
+            result.append((start, lo - 1))
+
+        start = max(start, hi + 1)
+
+    if start <= maxunicode:
+        result.append((start, maxunicode))
+
+    return result
+
+
+@lru_cache(maxsize=65536)
+def get_contained(inner: str, outer: str, limit: int = 10000) -> Optional[bool]:
+    # Check if the outer word hits every text that the inner word hits, return None if it can not be decided
+    result = None
+    try:
+        a = get_nfa(inner)
+        b = get_nfa(outer)
+
+        if not a or not b:
+            return None
+
+        # Every match of the inner word needs to contain a match of the outer word,
+        # so walk both automatons together and look for a match of the inner word that the outer word misses
+        b_start = get_closure(b, {0})
+
+        if b["accept"] in b_start:
+            return True
+
+        start = (get_closure(a, {0}), b_start)
+        queue = [start]
+        seen = {start}
+
+        while queue:
+            a_states, b_states = queue.pop()
+
+            if a["accept"] in a_states:
+                return False
+
+            a_edges = [(label, target) for state in a_states for label, target in a["edges"][state]]
+            b_edges = [(label, target) for state in b_states for label, target in b["edges"][state]]
+
+            for c in get_representatives([label for label, _ in a_edges + b_edges]):
+                a_next = get_closure(a, {t for label, t in a_edges if get_member(label, c)})
+
+                if not a_next:
+                    continue
+
+                b_next = get_closure(b, {t for label, t in b_edges if get_member(label, c)} | {0})
+
+                if b["accept"] in b_next or (a_next, b_next) in seen:
+                    continue
+
+                if len(seen) >= limit:
+                    return None
+
+                seen.add((a_next, b_next))
+                queue.append((a_next, b_next))
+
+        result = True
+    except Exception as e:
+        logger.warning(f"Get contained error: {e}", exc_info=True)
+        result = None
+
+    return result
+
+
+def get_contained_chunk(task: List[Tuple[str, List[str]]]) -> List[Tuple[str, str]]:
+    # Get the pairs of words in a chunk that the outer words contain the inner words, it may run in the process pool
+    result = []
+    try:
+        for inner, outers in task:
+            result += [(inner, outer) for outer in outers if get_contained(inner, outer)]
+    except Exception as e:
+        logger.warning(f"Get contained chunk error: {e}", exc_info=True)
+
+    return result
+
+
+def get_cost(word: str) -> Union[bool, None, Tuple[float, bool]]:
+    # Get the worst search time of a word and whether it grows super-linearly,
+    # return None if a single input runs out of time or the time grows exponentially,
+    # return False if the word cannot be measured
+    result = False
+    try:
+        costs = {}
+
+        with glovar.locks["cost"]:
+            # The measurer is only started before the threads, forking the running bot may hang it
+            if not glovar.measurer:
+                logger.warning("Get cost error: the measurer is not running")
+                return False
+
+            # Each input has its own time limit, so a long sweep of a quadratic word is not rejected
+            try:
+                glovar.measurer.send((word, get_pumps(word), 2))
+
+                for item in iter(glovar.measurer.recv, None):
+                    if item is False:
+                        return None
+
+                    costs.setdefault(item[0], []).append(item[1:])
+            except (EOFError, OSError) as e:
+                logger.warning(f"Get cost error: the measurer is broken: {e}")
+                glovar.measurer.close()
+                glovar.measurer = None
+                return False
+
+        # Compare the times of the inputs whose lengths are doubled, short times are too noisy to be compared
+        worst = max((c for pump in costs for _, c in costs[pump]), default=0.0)
+        growths = [(log2(b[1] / max(a[1], 0.001)) / log2(b[0] / a[0]), a[1] >= 0.001)
+                   for pump in costs for a, b in zip(costs[pump], costs[pump][1:]) if b[1] >= 0.01]
+
+        # Quadratic and cubic words are allowed, words that are much worse are taken as exponential
+        if any(growth > 4 and reliable for growth, reliable in growths):
+            return None
+
+        result = (worst, any(growth > 1.5 for growth, _ in growths))
+    except Exception as e:
+        logger.warning(f"Get cost error: {e}", exc_info=True)
+
+    return result
+
+
+def get_flags(word: str) -> int:
+    # Get the flags of a word from its comments
+    result = 0
+    try:
+        comments = [c.split(")")[0].strip() for c in word.split("(?# ")[1:]]
+
+        if "(?# nocr)" in word:
+            result |= glovar.bits["nocr"]
+
+        if any("temp" in comment for comment in comments):
+            result |= glovar.bits["temp"]
+
+        if any("forever" in comment for comment in comments):
+            result |= glovar.bits["forever"]
+    except Exception as e:
+        logger.warning(f"Get flags error: {e}", exc_info=True)
+
+    return result
+
+
+@lru_cache(maxsize=None)
+def get_fold_changes() -> Tuple[int, ...]:
+    # Get the code points that are changed by case folding, they are never found in a folded text
+    result = ()
+    try:
+        result = tuple(i for i in range(maxunicode + 1) if get_fold_char(i) != i)
+    except Exception as e:
+        logger.warning(f"Get fold changes error: {e}", exc_info=True)
+
+    return result
+
+
+def get_fold_char(c: int) -> int:
+    # Get the code point of a case folded character
+    folded = chr(c).translate(folds).lower().translate(folds)
+
+    if len(folded) != 1:
+        return c
+
+    return ord(folded)
+
+
+def get_fold_class(intervals: List[Tuple[int, int]], negate: bool = False) -> Tuple[Tuple[int, int], ...]:
+    # Get the sorted and merged code point intervals of a class in the case folded text
+    changes = get_fold_changes()
+    points = []
+    result = []
+
+    for lo, hi in intervals:
+        points += [get_fold_char(c) for c in changes[bisect_right(changes, lo - 1):bisect_right(changes, hi)]]
+
+    for lo, hi in sorted(list(intervals) + [(c, c) for c in points]):
+        if result and lo <= result[-1][1] + 1:
+            result[-1] = (result[-1][0], max(result[-1][1], hi))
+        else:
+            result.append((lo, hi))
+
+    if negate:
+        result = get_complement(result)
+
+    return tuple(result)
+
+
+@lru_cache(maxsize=None)
+def get_fold_unsafe() -> Dict[int, str]:
+    # Get the code points that re and the linear-time engine case fold differently, with what re matches for each
+    result = {}
+    try:
+        if not re2:
+            return {}
+
+        cased = set()
+
+        for i in range(maxunicode + 1):
+            if 0xd800 <= i <= 0xdfff:
+                continue
+
+            for variant in {chr(i).lower(), chr(i).upper(), chr(i).casefold()} - {chr(i)}:
+                cased.add(i)
+                len(variant) == 1 and cased.add(ord(variant))
+
+        text = "".join(chr(i) for i in sorted(cased))
+
+        for i in sorted(cased):
+            by_re = "".join(sorted(set(re.findall(re.escape(chr(i)), text, re.I))))
+            by_re2 = "".join(sorted({m.group() for m in re2.finditer(f"(?i){get_linear_char(i)}", text)}))
+
+            if by_re != by_re2:
+                result[i] = by_re
+    except Exception as e:
+        logger.warning(f"Get fold unsafe error: {e}", exc_info=True)
+
+    return result
+
+
+@lru_cache(maxsize=64)
+def get_folded(text: str) -> str:
+    # Get the case folded text without whitespace, which the required literals are searched in
+    result = ""
+    try:
+        result = re.sub(r"\s", "", text).translate(folds).lower().translate(folds)
+    except Exception as e:
+        logger.warning(f"Get folded error: {e}", exc_info=True)
+
+    return result
+
+
+@lru_cache(maxsize=None)
+def get_intervals(category: str) -> Tuple[Tuple[int, int], ...]:
+    # Get the code point intervals of a category, with the same meaning as the re module
+    result = []
+    try:
+        check = {
+            "digit": lambda x: x.isdecimal(),
+            "space": lambda x: x.isspace(),
+            "word": lambda x: x.isalnum() or x == "_"
+        }[category]
+        start = None
+
+        for i in range(maxunicode + 1):
+            if check(chr(i)):
+                if start is None:
+                    start = i
+            elif start is not None:
+                result.append((start, i - 1))
+                start = None
+
+        if start is not None:
+            result.append((start, maxunicode))
+    except Exception as e:
+        logger.warning(f"Get intervals error: {e}", exc_info=True)
+
+    return tuple(result)
+
+
+def get_linear(word: str) -> str:
+    # Translate a word to the syntax of the linear-time engine, return an empty string if it is not supported
+    result = ""
+    try:
+        parsed = sre_parse.parse(word, re.I | re.M | re.S)
+
+        if parsed.state.flags & (re.A | re.L):
+            return ""
+
+        result = "(?ims)" + get_linear_nodes(parsed)
+    except Exception as e:
+        logger.info(f"Get linear error: {e}")
+        result = ""
+
+    return result
+
+
+def get_linear_char(c: int) -> str:
+    # Get a character in the syntax of the linear-time engine
+    if c < 128 and chr(c).isalnum():
+        return chr(c)
+
+    return f"\\x{{{c:x}}}"
+
+
+def get_linear_class(items: list) -> str:
+    # Get a character class in the syntax of the linear-time engine
+    result = ""
+    plain = [(op, av) for op, av in items if op is not sre_parse.NEGATE]
+    negate = len(plain) < len(items)
+    count = len(plain)
+
+    # Keep the word and digit categories as property classes, their code point intervals are too large
+    for op, av in list(plain):
+        name = str(av).lower().replace("category_", "")
+
+        if op is not sre_parse.CATEGORY or name.replace("not_", "") not in {"digit", "word"}:
+            continue
+
+        if name.startswith("not_") and count > 1:
+            raise ValueError("Negated category in a class")
+
+        negate = negate != name.startswith("not_")
+        result += name.endswith("word") and "\\pL\\pN_" or "\\p{Nd}"
+        plain.remove((op, av))
+
+    _, intervals = get_class(plain)
+
+    # Spell out what re matches for the characters that are case folded differently
+    for c, equivalents in get_fold_unsafe().items():
+        if not any(lo <= c <= hi for lo, hi in intervals):
+            continue
+
+        if negate:
+            raise ValueError("Negated class of a character that is case folded differently")
+
+        intervals += [(ord(char), ord(char)) for char in equivalents]
+
+    # Surrogates can not be encoded in UTF-8
+    for lo, hi in intervals:
+        for a, b in [(lo, min(hi, 0xd7ff)), (max(lo, 0xe000), hi)]:
+            if a > b:
+                continue
+
+            result += get_linear_char(a) if a == b else f"{get_linear_char(a)}-{get_linear_char(b)}"
+
+    if not result:
+        raise ValueError("Empty class")
+
+    return f"[{negate and '^' or ''}{result}]"
+
+
+def get_linear_nodes(nodes: list) -> str:
+    # Get a sequence of parsed nodes in the syntax of the linear-time engine
+    result = ""
+
+    for op, av in nodes:
+        if op is sre_parse.LITERAL and av in get_fold_unsafe():
+            result += "[" + "".join(get_linear_char(ord(char)) for char in get_fold_unsafe()[av]) + "]"
+        elif op is sre_parse.LITERAL:
+            result += get_linear_char(av)
+        elif op is sre_parse.NOT_LITERAL and av in get_fold_unsafe():
+            raise ValueError("Negated character that is case folded differently")
+        elif op is sre_parse.NOT_LITERAL:
+            result += f"[^{get_linear_char(av)}]"
+        elif op is sre_parse.ANY:
+            result += "."
+        elif op is sre_parse.IN:
+            result += get_linear_class(av)
+        elif op is sre_parse.BRANCH:
+            result += "(?:" + "|".join(get_linear_nodes(b) for b in av[1]) + ")"
+        elif op is sre_parse.SUBPATTERN:
+            add_flags, del_flags = av[1], av[2]
+
+            if (add_flags | del_flags) & (re.A | re.L):
+                raise ValueError("Unsupported flags")
+
+            # The case folding of the characters above is only spelled out for the case-insensitive words
+            if del_flags & re.I:
+                raise ValueError("Case-sensitive group")
+
+            flags = "".join(f for f, v in [("i", re.I), ("m", re.M), ("s", re.S)] if add_flags & v)
+            flags += "".join(f"-{f}" for f, v in [("i", re.I), ("m", re.M), ("s", re.S)] if del_flags & v)
+            result += f"(?{flags}:{get_linear_nodes(av[3])})"
+        elif op in {sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT}:
+            low, high, item = av
+
+            if low > 1000 or (high is not sre_parse.MAXREPEAT and high > 1000):
+                raise ValueError("Repeat count is too large")
+
+            high = "" if high is sre_parse.MAXREPEAT else str(high)
+            lazy = op is sre_parse.MIN_REPEAT and "?" or ""
+            result += f"(?:{get_linear_nodes(item)}){{{low},{high}}}{lazy}"
+        elif op is sre_parse.AT and av is sre_parse.AT_BEGINNING:
+            result += "^"
+        elif op is sre_parse.AT and av is sre_parse.AT_END:
+            result += "$"
+        elif op is sre_parse.AT and av is sre_parse.AT_BEGINNING_STRING:
+            result += "\\A"
+        elif op is sre_parse.AT and av is sre_parse.AT_END_STRING:
+            result += "\\z"
+        else:
+            # Word boundaries of the linear-time engine are ASCII only,
+            # lookarounds, backreferences and other extensions are not supported
+            raise ValueError(f"Unsupported node {op}")
+
+    return result
+
+
+@lru_cache(maxsize=4096)
+def get_linear_pattern(linear: str) -> Optional[object]:
+    # Get the compiled pattern of a word in the syntax of the linear-time engine
+    result = None
+    try:
+        if not linear:
+            return None
+
+        result = re2.compile(linear)
+    except Exception as e:
+        logger.warning(f"Get linear pattern error: {e}", exc_info=True)
+
+    return result
+
+
+def get_literals(word: str) -> Set[str]:
+    # Get the literals that every match of a word contains one of, return an empty set if there are none
+    result = set()
+    try:
+        result = get_literals_nodes(sre_parse.parse(word, re.I | re.M | re.S))
+    except Exception as e:
+        logger.info(f"Get literals error: {e}")
+        result = set()
+
+    return result
+
+
+def get_literals_nodes(nodes: list) -> Set[str]:
+    # Get the best set of required literals of a sequence of parsed nodes
+    result = set()
+    literal = ""
+    candidates = []
+
+    for op, av in nodes:
+        if op is sre_parse.LITERAL:
+            # Whitespace is removed from the text before searching
+            if not chr(av).isspace():
+                literal += chr(av)
+
+            continue
+
+        literal and candidates.append({literal})
+        literal = ""
+
+        if op is sre_parse.SUBPATTERN:
+            candidates.append(get_literals_nodes(av[3]))
+        elif op in {sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT} and av[0] > 0:
+            candidates.append(get_literals_nodes(av[2]))
+        elif op is sre_parse.BRANCH:
+            branches = [get_literals_nodes(b) for b in av[1]]
+
+            if all(branches):
+                candidates.append(set().union(*branches))
+
+    literal and candidates.append({literal})
+
+    # Prefer the set whose shortest literal is the longest, then the set with fewer literals
+    for candidate in candidates:
+        candidate = {get_folded(c) for c in candidate}
+
+        if not candidate or not all(candidate):
+            continue
+
+        if (not result
+                or min(map(len, candidate)) > min(map(len, result))
+                or (min(map(len, candidate)) == min(map(len, result)) and len(candidate) < len(result))):
+            result = candidate
+
+    return result
+
+
+def get_matches(word_type: str, text: str, ocr: bool = False, limit: int = 0,
+                results: Dict[str, Optional[Match]] = None) -> List[Tuple[str, Match]]:
+    # Get the words of a word type that the text hits and their matches, stop at the limit if it is set
+    result = []
+    try:
+        if not text:
+            return []
+
+        # Check the whitespace collapsed text first, then the whitespace stripped one
+        texts = list(get_variants(text))
+
+        for word in get_words(word_type, text, ocr):
+            match = get_search(word_type, word, texts, results)
+
+            if not match:
+                continue
+
+            result.append((word, match))
+
+            if limit and len(result) >= limit:
+                return result
+
+        # Keep the order of the words
+        matches = dict(result)
+        result = [(w, matches[w]) for w in get_ordered(word_type, list(matches))]
+    except Exception as e:
+        logger.warning(f"Get matches error: {e}", exc_info=True)
+
+    return result
+
+
+def get_measurer() -> Optional[Connection]:
+    # Start the process that measures the costs of the words, it should be started before any thread
+    result = None
+    try:
+        conn, child_conn = Pipe()
+        process = get_context("fork").Process(target=serve_costs, args=(child_conn,), daemon=True)
+        process.start()
+        child_conn.close()
+        result = conn
+    except Exception as e:
+        logger.warning(f"Get measurer error: {e}", exc_info=True)
+
+    return result
+
+
+def get_member(intervals: Tuple[Tuple[int, int], ...], c: int) -> bool:
+    # Check if a code point is in the sorted intervals
+    i = bisect_right(intervals, (c, maxunicode + 1)) - 1
+
+    return i >= 0 and intervals[i][0] <= c <= intervals[i][1]
+
+
+@lru_cache(maxsize=8192)
+def get_nfa(word: str, limit: int = 2000) -> Optional[Dict[str, Union[int, list]]]:
+    # Get the automaton of a word over the case folded text, return None if the syntax is not supported
+    result = None
+    try:
+        parsed = sre_parse.parse(word, re.I | re.M | re.S)
+
+        if parsed.state.flags & (re.A | re.L):
+            return None
+
+        result = {"edges": [[]], "eps": [[]], "accept": 0, "limit": limit}
+        result["accept"] = get_nfa_nodes(result, parsed, 0)
+    except Exception as e:
+        logger.info(f"Get nfa error: {e}")
+        result = None
+
+    return result
+
+
+def get_nfa_nodes(nfa: Dict[str, Union[int, list]], nodes: list, start: int) -> int:
+    # Add a sequence of parsed nodes to the automaton after the start state, return the end state
+    state = start
+
+    for op, av in nodes:
+        if len(nfa["edges"]) > nfa["limit"]:
+            raise ValueError("Automaton is too large")
+
+        if op in {sre_parse.LITERAL, sre_parse.NOT_LITERAL, sre_parse.ANY, sre_parse.IN}:
+            if op is sre_parse.LITERAL:
+                label = get_fold_class([(av, av)])
+            elif op is sre_parse.NOT_LITERAL:
+                label = get_fold_class([(av, av)], True)
+            elif op is sre_parse.ANY:
+                label = ((0, maxunicode),)
+            else:
+                negate, intervals = get_class(av)
+                label = get_fold_class(intervals, negate)
+
+            end = get_nfa_state(nfa)
+            nfa["edges"][state].append((label, end))
+            state = end
+        elif op is sre_parse.BRANCH:
+            end = get_nfa_state(nfa)
+
+            for branch in av[1]:
+                branch_start = get_nfa_state(nfa)
+                nfa["eps"][state].append(branch_start)
+                nfa["eps"][get_nfa_nodes(nfa, branch, branch_start)].append(end)
+
+            state = end
+        elif op is sre_parse.SUBPATTERN:
+            if av[2] & (re.I | re.S):
+                raise ValueError("Unsupported flags")
+
+            state = get_nfa_nodes(nfa, av[3], state)
+        elif op in {sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT}:
+            low, high, item = av
+
+            if low > 100 or (high is not sre_parse.MAXREPEAT and high > 100):
+                raise ValueError("Repeat count is too large")
+
+            for _ in range(low):
+                state = get_nfa_nodes(nfa, item, state)
+
+            if high is sre_parse.MAXREPEAT:
+                loop = get_nfa_state(nfa)
+                nfa["eps"][state].append(loop)
+                nfa["eps"][get_nfa_nodes(nfa, item, loop)].append(loop)
+                state = loop
+            else:
+                end = get_nfa_state(nfa)
+
+                for _ in range(high - low):
+                    nfa["eps"][state].append(end)
+                    state = get_nfa_nodes(nfa, item, state)
+
+                nfa["eps"][state].append(end)
+                state = end
+        else:
+            # Anchors, word boundaries, lookarounds and backreferences depend on the context of the match
+            raise ValueError(f"Unsupported node {op}")
+
+    return state
+
+
+def get_nfa_state(nfa: Dict[str, Union[int, list]]) -> int:
+    # Add a new state to the automaton
+    nfa["edges"].append([])
+    nfa["eps"].append([])
+
+    return len(nfa["edges"]) - 1
+
+
+def get_ordered(word_type: str, words: List[str]) -> List[str]:
+    # Sort the words in the order of the word type
+    result = words
+    try:
+        if len(words) < 2:
+            return words
+
+        word_set = set(words)
+        result = [w for w in list(glovar.compiled[word_type]) if w in word_set]
+    except Exception as e:
+        logger.warning(f"Get ordered error: {e}", exc_info=True)
+
+    return result
+
+
+def get_pattern(word: str, word_type: str = "") -> Optional[Pattern]:
+    # Get the compiled pattern of a word
+    result = None
+    try:
+        if word_type:
+            result = get_compiled(word_type, word) if word_type in glovar.compiled else None
+        else:
+            for w_t in glovar.compiled:
+                result = get_compiled(w_t, word)
+
+                if result:
+                    break
+
+        if result:
+            return result
+
+        result = re.compile(word, re.I | re.M | re.S)
+    except Exception as e:
+        logger.warning(f"Get pattern error: {e}", exc_info=True)
+
+    return result
+
+
+def get_pool(processes: int) -> Optional[Pool]:
+    # Start a process pool whose processes hold the snapshots of the rules, it should be started before any thread
+    result = None
+    try:
+        versions = dict(glovar.versions)
+        rules = {w_t: list(glovar.compiled[w_t]) for w_t in glovar.compiled}
+
+        # Let the processes share the case folding table of the similarity checks
+        get_fold_changes()
+
+        result = get_context("fork").Pool(processes, init_snapshots, (versions, rules))
+    except Exception as e:
+        logger.warning(f"Get pool error: {e}", exc_info=True)
+
+    return result
+
+
+def get_pool_matches(text: str, word_types: List[str]) -> Optional[Dict[str, List[str]]]:
+    # Get the words of each word type that the text hits with the process pool, return None if it is not used
+    result = None
+    try:
+        texts = list(get_variants(text))
+        type_words = {}
+        items = []
+        owners = set()
+
+        # Each distinct word is only searched once, the words are spread across the processes in chunks
+        for word_type in word_types:
+            type_words[word_type] = get_words(word_type, text)
+            items += [(word_type, w) for w in type_words[word_type] if w not in owners]
+            owners.update(type_words[word_type])
+
+        # A single chunk is not worth the round trip
+        if len(items) <= 64:
+            return None
+
+        tasks = []
+
+        for i in range(0, len(items), 64):
+            chunk = items[i:i + 64]
+            versions = {w_t: glovar.versions[w_t] for w_t, _ in chunk}
+            tasks.append((versions, chunk, texts, {}))
+
+        results = glovar.pool.map_async(search_words, tasks, 1).get(60)
+
+        # Send the rules of the word types again to the processes whose snapshots are out of date
+        stale = []
+
+        for task, (_, stale_types, _) in zip(tasks, results):
+            if not stale_types:
+                continue
+
+            versions = {w_t: glovar.versions[w_t] for w_t in task[0]}
+            rules = {w_t: list(glovar.compiled[w_t]) for w_t in stale_types}
+            stale.append((versions, task[1], texts, rules))
+
+        if stale:
+            results = [r for r in results if not r[1]] + glovar.pool.map_async(search_words, stale, 1).get(60)
+
+        if any(r[1] for r in results):
+            return None
+
+        for word_type, word, cost in (c for r in results for c in r[2]):
+            add_profile(word_type, word, cost)
+
+        hits = {w for r in results for w in r[0]}
+        result = {w_t: get_ordered(w_t, [w for w in type_words[w_t] if w in hits]) for w_t in word_types}
+    except Exception as e:
+        logger.warning(f"Get pool matches error: {e}", exc_info=True)
+        result = None
+
+    return result
+
+
+def get_pumps(word: str) -> List[str]:
+    # Get the strings that are repeated to make the adversarial inputs of a word
+    result = []
+    try:
+        samples = []
+
+        for _ in range(4):
+            try:
+                samples.append(xg.xeger(word))
+            except Exception as e:
+                logger.info(f"Get sample of {word} error: {e}")
+                break
+
+        # The samples, their characters, the word characters of the word and some common characters
+        for sample in samples:
+            result += [sample] + list(sample)
+
+        result += re.findall(r"[^\W_]", word) + ["a", "0", " "]
+        result = list(dict.fromkeys(p for p in result if p))[:32]
+    except Exception as e:
+        logger.warning(f"Get pumps error: {e}", exc_info=True)
+
+    return result
+
+
+def get_redundant(word_type: str) -> Dict[str, List[str]]:
+    # Get the redundant words of a word type, grouped by the word that contains them
+    result = {}
+    try:
+        words = list(eval(f"glovar.{word_type}_words"))
+        order = {w: i for i, w in enumerate(words)}
+        tasks = []
+
+        # Only the words that hit every sample of a word may contain it, the words added during the scan are skipped
+        for word in words:
+            outers = None
+
+            for sample in get_word_bank(word_type, word):
+                hits = set()
+
+                for w in get_words(word_type, sample):
+                    pattern = get_pattern(w, word_type) if w in order else None
+
+                    if pattern and pattern.search(sample):
+                        hits.add(w)
+
+                outers = hits if outers is None else outers & hits
+
+            if not outers:
+                continue
+
+            # The outer word should hit the texts in every case that the inner word does
+            flags = get_word_flags(word_type, word)
+            outers = [w for w in outers if w != word and not get_word_flags(word_type, w) & ~flags]
+            outers and tasks.append((word, sorted(outers, key=order.get)))
+
+        chunks = [tasks[i:i + 64] for i in range(0, len(tasks), 64)]
+
+        if glovar.pool and len(chunks) > 1:
+            pairs = [pair for chunk in glovar.pool.map(get_contained_chunk, chunks) for pair in chunk]
+        else:
+            pairs = [pair for chunk in chunks for pair in get_contained_chunk(chunk)]
+
+        containers = {}
+
+        for inner, outer in pairs:
+            containers.setdefault(inner, []).append(outer)
+
+        # A word is redundant if it is contained by another word, the earlier one of the equivalent words is kept
+        redundant = {w for w in containers
+                     if any(w not in containers.get(o, []) or order[o] < order[w] for o in containers[w])}
+
+        for word in sorted(redundant, key=order.get):
+            kept = [o for o in containers[word] if o not in redundant]
+
+            if kept:
+                result.setdefault(kept[0], []).append(word)
+    except Exception as e:
+        logger.warning(f"Get redundant error: {e}", exc_info=True)
+
+    return result
+
+
+def get_representatives(labels: List[Tuple[Tuple[int, int], ...]]) -> List[int]:
+    # Get a code point of each range of characters that the labels can not tell apart
+    result = []
+    changes = get_fold_changes()
+    points = sorted({p for label in labels for lo, hi in label for p in (lo, hi + 1)})
+
+    for lo, end in zip(points, points[1:]):
+        # Skip the characters that are never found in a folded text
+        c = lo
+        i = bisect_right(changes, c - 1)
+
+        while c < end and i < len(changes) and changes[i] == c:
+            c += 1
+            i += 1
+
+        if c < end:
+            result.append(c)
+
+    return result
+
+
+def get_samples(word_type: str, limit: int = 100) -> List[str]:
+    # Get the sample texts of a word type, made from the words and their required literals
+    result = []
+    try:
+        get_automaton(word_type)
+        words = list(glovar.compiled[word_type])
+        literals = [literal for w in words for literal in glovar.literals[word_type].get(w, set())]
+
+        for word in sample(words, min(limit, len(words))):
+            try:
+                result.append(xg.xeger(word))
+            except Exception as e:
+                logger.info(f"Get sample of {word} error: {e}")
+
+        for _ in range(limit if literals else 0):
+            result.append(" ".join(choice(literals) for _ in range(8)))
+
+        result += ["项脊轩，旧南阁子也。室仅方丈，可容一人居。",
+                   "Lorem ipsum dolor sit amet, consectetur adipiscing elit."]
+    except Exception as e:
+        logger.warning(f"Get samples error: {e}", exc_info=True)
+
+    return result
+
+
+def get_search(word_type: str, word: str, texts: List[str],
+               results: Dict[str, Optional[Match]] = None) -> Optional[Match]:
+    # Search the texts with a word, the results are shared by the same word of different types
+    result = None
+    try:
+        if results is not None and word in results:
+            return results[word]
+
+        # The linear-time engine only rules out the texts, its hits are confirmed by re
+        if glovar.backends[word_type].get(word) == "re2":
+            linear = get_linear_pattern(glovar.linear[word_type][word])
+        else:
+            linear = None
+
+        pattern = get_compiled(word_type, word)
+
+        if not pattern:
+            return None
+
+        start = perf_counter()
+
+        for text in texts:
+            if linear and not linear.search(text):
+                continue
+
+            result = pattern.search(text)
+
+            if result:
+                break
+
+        add_profile(word_type, word, perf_counter() - start)
+
+        if results is not None:
+            results[word] = result
+    except Exception as e:
+        logger.warning(f"Get search error: {e}", exc_info=True)
+
+    return result
+
+
+def get_search_candidates(mode: str, word: str) -> Optional[Set[str]]:
+    # Get the words that a search may find with the trigram index, return None if all words should be checked
+    result = None
+    try:
+        if mode == "find":
+            literals = {get_folded(word)}
+        elif mode == "search":
+            literals = get_literals(word)
+        else:
+            return None
+
+        if not literals or not all(literals):
+            return None
+
+        # Build the index in one pass when it is first used, then add and remove keep it up to date
+        if glovar.trigrams is None:
+            glovar.trigrams = {}
+
+            for w in list(glovar.rule_types):
+                for trigram in get_trigrams(w):
+                    glovar.trigrams.setdefault(trigram, set()).add(w)
+
+        # Every found word contains one of the literals, so it has all the trigrams of that literal,
+        # or a trigram that contains the literal if the literal is shorter
+        result = set()
+
+        for literal in literals:
+            if len(literal) < 3:
+                result.update(w for trigram, words in list(glovar.trigrams.items()) if literal in trigram for w in words)
+                continue
+
+            postings = sorted((glovar.trigrams.get(literal[i:i + 3], set()) for i in range(len(literal) - 2)), key=len)
+            result.update(postings[0].intersection(*postings[1:]))
+    except Exception as e:
+        logger.warning(f"Get search candidates error: {e}", exc_info=True)
+        result = None
+
+    return result
+
+
+def get_search_samples(word: str, words: Dict[str, Set[str]]) -> Set[str]:
+    # Get the words whose sample banks the searched word hits, the missing banks are generated and stored
+    result = set()
+    try:
+        pattern = get_pattern(word)
+
+        if not pattern:
+            return set()
+
+        created = {}
+
+        for w, word_types in words.items():
+            for word_type in word_types:
+                if w not in glovar.samples[word_type]:
+                    created[(word_type, w)] = get_word_bank(word_type, w)
+
+                if any(pattern.search(sample) for sample in get_word_bank(word_type, w)):
+                    result.add(w)
+                    break
+
+        journal("samples", created)
+    except Exception as e:
+        logger.warning(f"Get search samples error: {e}", exc_info=True)
+
+    return result
+
+
+def get_similar(word_type: str, word: str, bank: List[str], words: List[str] = None) -> List[str]:
+    # Get the words of a word type that are similar to the word, one of them hits every text that the other one hits
+    result = []
+    try:
+        if words is None:
+            words = list(eval(f"glovar.{word_type}_words"))
+
+        banks = [get_word_bank(word_type, w) for w in words]
+        result = get_similar_chunk((word_type, word, bank, words, banks))
+    except Exception as e:
+        logger.warning(f"Get similar error: {e}", exc_info=True)
+
+    return result
+
+
+def get_similar_chunk(task: Tuple[str, str, List[str], List[str], List[List[str]]]) -> List[str]:
+    # Get the similar words in a chunk of words and their sample banks, it may run in the process pool
+    result = []
+    try:
+        word_type, word, bank, words, banks = task
+        pattern = get_pattern(word)
+
+        if not pattern:
+            return []
+
+        for old, old_bank in zip(words, banks):
+            old_pattern = get_pattern(old, word_type)
+
+            if not old_pattern:
+                continue
+
+            # A sample that is missed by the other word rules out the containment in that direction
+            pairs = []
+
+            if all(old_pattern.search(sample) for sample in bank):
+                pairs.append((word, old))
+
+            if all(pattern.search(sample) for sample in old_bank):
+                pairs.append((old, word))
+
+            contained = [get_contained(inner, outer) for inner, outer in pairs]
+
+            if any(contained):
+                result.append(old)
+                continue
+
+            if None not in contained or not bank or not old_bank:
+                continue
+
+            # Use the sample banks for the syntax that the automatons do not support
+            if all(old_pattern.search(new_sample) or pattern.search(old_sample)
+                   for new_sample, old_sample in zip(bank, old_bank)):
+                result.append(old)
+    except Exception as e:
+        logger.warning(f"Get similar chunk error: {e}", exc_info=True)
+
+    return result
+
+
+def get_similar_words(word_type: str, word: str, bank: List[str], words: List[str]) -> List[str]:
+    # Get the similar words in a snapshot of a word type, spread them across the process pool if it is used
+    result = []
+    try:
+        banks = [get_word_bank(word_type, w) for w in words]
+
+        if not glovar.pool or not glovar.limit_similar or len(words) <= 256:
+            return get_similar_chunk((word_type, word, bank, words, banks))
+
+        tasks = [(word_type, word, bank, words[i:i + 256], banks[i:i + 256]) for i in range(0, len(words), 256)]
+        jobs = [glovar.pool.apply_async(get_similar_chunk, (task,)) for task in tasks]
+        deadline = time() + glovar.limit_similar
+
+        for task, job in zip(tasks, jobs):
+            try:
+                result += job.get(max(deadline - time(), 0))
+            except TimeoutError:
+                # Scan the chunks that are not finished within the latency budget locally
+                result += get_similar_chunk(task)
+    except Exception as e:
+        logger.warning(f"Get similar words error: {e}", exc_info=True)
+
+    return result
+
+
+def get_trigrams(word: str) -> Set[str]:
+    # Get the trigrams of the case folded word, a shorter word is kept as it is
+    folded = get_folded(word)
+
+    return {folded[i:i + 3] for i in range(len(folded) - 2)} or {folded}
+
+
+def get_type_matches(text: str, word_types: List[str]) -> Dict[str, List[str]]:
+    # Get the words of each word type that the text hits, each distinct word is only searched once
+    result = {}
+    try:
+        # Take the versions before searching, so the results of a changed word type are never cached as new
+        keys = {word_type: get_cache_key(word_type, text) for word_type in word_types}
+        cached = {}
+
+        for word_type in word_types:
+            words = get_cache(keys[word_type])
+
+            if words is not None:
+                cached[word_type] = words
+
+        missed = [word_type for word_type in word_types if word_type not in cached]
+        type_matches = missed and glovar.pool and get_pool_matches(text, missed)
+
+        if missed and not type_matches:
+            type_matches = {}
+            results = {}
+
+            for word_type in missed:
+                type_matches[word_type] = [w for w, _ in get_matches(word_type, text, False, 0, results)]
+
+        for word_type in missed:
+            cached[word_type] = type_matches.get(word_type, [])
+            add_cache(keys[word_type], cached[word_type])
+
+        # Keep the order of the word types, the reports follow it
+        result = {word_type: cached[word_type] for word_type in word_types}
+    except Exception as e:
+        logger.warning(f"Get type matches error: {e}", exc_info=True)
+
+    return result
+
+
+@lru_cache(maxsize=64)
+def get_variants(text: str) -> Tuple[str, ...]:
+    # Get the normalized variants of the text
+    result = ()
+    try:
+        # Collapse the consecutive whitespace
+        collapsed = re.sub(r"\s{2,}", " ", text)
+        result = (collapsed,)
+
+        if " " not in collapsed:
+            return result
+
+        # Strip all the whitespace
+        result += (re.sub(r"\s", "", collapsed),)
+    except Exception as e:
+        logger.warning(f"Get variants error: {e}", exc_info=True)
+
+    return result
+
+
+def get_words(word_type: str, text: str, ocr: bool = False) -> List[str]:
+    # Get the words of a word type that may be hit by the text, they still need to be searched
+    result = []
+    try:
+        texts = list(get_variants(text))
+        nocr = glovar.bits["nocr"]
+
+        # The words in the combined pattern set only need to be checked if the set hits them
+        combined_words = get_combined_words(word_type, texts)
+
+        if combined_words is None:
+            result = [w for w in list(glovar.compiled[word_type])
+                      if not ocr or not get_word_flags(word_type, w) & nocr]
+        elif ocr:
+            result = [w for w in combined_words if not get_word_flags(word_type, w) & nocr]
+            result += get_combined(word_type)["ocr_fallback"]
+        else:
+            result = combined_words + get_combined(word_type)["fallback"]
+
+        # Skip the words whose required literals are not in the text
+        candidates = get_candidates(word_type, text)
+
+        if candidates is not None:
+            result = [w for w in result if w in candidates]
+    except Exception as e:
+        logger.warning(f"Get words error: {e}", exc_info=True)
+
+    return result
+
+
+def get_word_bank(word_type: str, word: str) -> List[str]:
+    # Get the stored sample bank of a word of a word type, generate it if it is not stored yet
+    result = []
+    try:
+        result = glovar.samples[word_type].get(word)
+
+        if result is None:
+            result = get_bank(word)
+            glovar.samples[word_type][word] = result
+    except Exception as e:
+        logger.warning(f"Get word bank error: {e}", exc_info=True)
+
+    return result
+
+
+def get_word_flags(word_type: str, word: str) -> int:
+    # Get the flags of a word of a word type, parse them if they are not stored yet
+    result = 0
+    try:
+        result = glovar.flags[word_type].get(word)
+
+        if result is None:
+            result = get_flags(word)
+            glovar.flags[word_type][word] = result
+    except Exception as e:
+        logger.warning(f"Get word flags error: {e}", exc_info=True)
+
+    return result
+
+
+def prefetch_patterns() -> bool:
+    # Compile the rules and the combined patterns of all types in the background
+    try:
+        for word_type in list(glovar.compiled):
+            start = time()
+
+            for word in list(glovar.compiled[word_type]):
+                get_compiled(word_type, word)
+
+            get_combined(word_type)
+            logger.info(f"Prefetch {word_type} patterns in {time() - start:.3f}s")
+
+        return True
+    except Exception as e:
+        logger.warning(f"Prefetch patterns error: {e}", exc_info=True)
+
+    return False
+
+
+def remove_pattern(word_type: str, word: str) -> bool:
+    # Remove a word from the pattern cache
+    try:
+        glovar.compiled[word_type].pop(word, None)
+        glovar.backends[word_type].pop(word, None)
+        glovar.flags[word_type].pop(word, None)
+        glovar.linear[word_type].pop(word, None)
+        glovar.literals[word_type].pop(word, None)
+        glovar.profiles[word_type].pop(word, None)
+        glovar.samples[word_type].pop(word, None)
+        glovar.versions[word_type] += 1
+
+        word_types = glovar.rule_types.get(word, set())
+        word_types.discard(word_type)
+
+        if word_types:
+            return True
+
+        # Only forget the word when no word type holds it anymore
+        glovar.rule_types.pop(word, None)
+
+        for trigram in get_trigrams(word) if glovar.trigrams is not None else set():
+            words = glovar.trigrams.get(trigram, set())
+            words.discard(word)
+
+            if not words:
+                glovar.trigrams.pop(trigram, None)
+
+        return True
+    except Exception as e:
+        logger.warning(f"Remove pattern error: {e}", exc_info=True)
+
+    return False
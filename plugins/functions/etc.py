@@ -38,6 +38,30 @@ from .. import glovar
 logger = logging.getLogger(__name__)
 
 
+def add_session(the_type: str, key: str, session: dict) -> bool:
+    # Add a session to a session store, drop the expired sessions and the least recently used ones
+    try:
+        sessions = eval(f"glovar.{the_type}")
+        limit = glovar.sessions[the_type]["limit"]
+        ttl = glovar.sessions[the_type]["ttl"]
+        now = get_now()
+
+        session["time"] = session.get("time") or now
+        sessions[key] = session
+
+        for k in [k for k in list(sessions) if ttl and now - sessions[k]["time"] >= ttl]:
+            sessions.pop(k, None)
+
+        while len(sessions) > limit:
+            sessions.pop(min(sessions, key=lambda k: sessions[k]["time"]), None)
+
+        return True
+    except Exception as e:
+        logger.warning(f"Add session error: {e}", exc_info=True)
+
+    return False
+
+
 def bold(text: Any) -> str:
     # Get a bold text
     try:
@@ -400,6 +424,29 @@ def get_readable_time(secs: int = 0, the_format: str = "%Y%m%d%H%M%S") -> str:
     return result
 
 
+def get_session(the_type: str, key: str) -> Optional[dict]:
+    # Get a session from a session store, return None if it is expired
+    result = None
+    try:
+        sessions = eval(f"glovar.{the_type}")
+        ttl = glovar.sessions[the_type]["ttl"]
+        now = get_now()
+        result = sessions.get(key)
+
+        if not result:
+            return None
+
+        if ttl and now - result["time"] >= ttl:
+            sessions.pop(key, None)
+            return None
+
+        result["time"] = now
+    except Exception as e:
+        logger.warning(f"Get session error: {e}", exc_info=True)
+
+    return result
+
+
 def get_text(message: Message, normal: bool = False, printable: bool = False) -> str:
     # Get message's text, including links and buttons
     text = ""
@@ -21,6 +21,7 @@ from os import remove
 from os.path import exists
 from pickle import dump
 from shutil import copyfile
+from time import sleep
 from typing import Any
 
 from pyrogram import Client
@@ -28,6 +29,7 @@ from pyAesCrypt import decryptFile, encryptFile
 
 from .. import glovar
 from .etc import random_str, thread
+from .store import is_stored, update_stored
 from .telegram import download_media
 
 # Enable logging
@@ -113,10 +115,44 @@ def get_new_path(extension: str = "") -> str:
     return result
 
 
+def journal(file: str, changes: dict) -> bool:
+    # Append the changes of a global variable to its journal, use None as the value of a removed key
+    try:
+        if not glovar or not changes:
+            return True
+
+        if is_stored(file):
+            return update_stored(file[:-6], changes)
+
+        with glovar.locks["journal"]:
+            with open(f"data/{file}.journal", "ab") as f:
+                dump(changes, f)
+
+            glovar.journals[file] = glovar.journals.get(file, 0) + len(changes)
+            count = glovar.journals[file]
+
+        # Compact the journal once it is longer than the data itself
+        if count > max(glovar.limit_journal, len(eval(f"glovar.{file}"))):
+            save(file)
+
+        return True
+    except Exception as e:
+        logger.warning(f"Journal error: {e}", exc_info=True)
+
+    return False
+
+
 def save(file: str) -> bool:
-    # Save a global variable to a file
+    # Mark a global variable as dirty, the writer will save it to a file later
     try:
-        thread(save_thread, (file,))
+        if not glovar.save_interval:
+            return thread(save_thread, (file,))
+
+        with glovar.locks["save"]:
+            glovar.dirty.add(file)
+
+            if not glovar.writer:
+                glovar.writer = thread(save_writer, ())
 
         return True
     except Exception as e:
@@ -125,19 +161,48 @@ def save(file: str) -> bool:
     return False
 
 
+def save_dirty() -> bool:
+    # Save all dirty global variables to files
+    try:
+        with glovar.locks["save"]:
+            files = glovar.dirty.copy()
+            glovar.dirty.clear()
+
+        for file in files:
+            save_thread(file)
+
+        return True
+    except Exception as e:
+        logger.warning(f"Save dirty error: {e}", exc_info=True)
+
+    return False
+
+
 def save_thread(file: str) -> bool:
     # Save thread
     try:
         if not glovar:
             return True
 
-        with open(f"data/.{file}", "wb") as f:
-            dump(eval(f"glovar.{file}"), f)
+        with glovar.locks["journal"]:
+            with open(f"data/.{file}", "wb") as f:
+                dump(eval(f"glovar.{file}"), f)
 
-        copyfile(f"data/.{file}", f"data/{file}")
+            copyfile(f"data/.{file}", f"data/{file}")
+
+            if glovar.journals.get(file):
+                delete_file(f"data/{file}.journal")
+                glovar.journals[file] = 0
 
         return True
     except Exception as e:
         logger.error(f"Save thread error: {e}", exc_info=True)
 
     return False
+
+
+def save_writer() -> bool:
+    # Save the dirty global variables at most once per interval
+    while True:
+        sleep(glovar.save_interval)
+        save_dirty()
@@ -24,6 +24,7 @@ from pyrogram import CallbackQuery, Filters, Message
 from xeger import Xeger
 
 from .. import glovar
+from .engine import get_matches, get_pattern, get_variants
 
 # Enable logging
 logger = logging.getLogger(__name__)
@@ -162,34 +163,14 @@ regex_group = Filters.create(
 )
 
 
-def is_regex_text(word_type: str, text: str, ocr: bool = False, again: bool = False) -> Optional[Match]:
+def is_regex_text(word_type: str, text: str, ocr: bool = False) -> Optional[Match]:
     # Check if the text hit the regex rules
     result = None
     try:
-        if text:
-            if not again:
-                text = re.sub(r"\s{2,}", " ", text)
-            elif " " in text:
-                text = re.sub(r"\s", "", text)
-            else:
-                return None
-        else:
-            return None
-
-        words = list(eval(f"glovar.{word_type}_words"))
-
-        for word in words:
-            if ocr and "(?# nocr)" in word:
-                continue
-
-            result = re.search(word, text, re.I | re.S | re.M)
+        matches = get_matches(word_type, text, ocr, 1)
 
-            # Return
-            if result:
-                return result
-
-        # Try again
-        return is_regex_text(word_type, text, ocr, True)
+        if matches:
+            result = matches[0][1]
     except Exception as e:
         logger.warning(f"Is regex text error: {e}", exc_info=True)
 
@@ -226,13 +207,10 @@ def is_similar(mode: str, a: str, b: str) -> bool:
                 i += 1
 
         elif mode == "test":
-            b = re.sub(r"\s{2,}", " ", b)
-
-            if not re.search(a, b, re.I | re.M | re.S):
-                b = re.sub(r"\s", "", b)
+            pattern = get_pattern(a)
 
-                if not re.search(a, b, re.I | re.M | re.S):
-                    return False
+            if not any(pattern.search(t) for t in get_variants(b)):
+                return False
 
         return True
     except Exception as e:
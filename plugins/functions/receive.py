@@ -26,7 +26,7 @@ from pyrogram import Client, Message
 from .. import glovar
 from .channel import share_data
 from .etc import code, get_now, get_text, lang, mention_id, thread
-from .file import crypt_file, data_to_file, delete_file, get_downloaded_path, get_new_path, save
+from .file import crypt_file, data_to_file, delete_file, get_downloaded_path, get_new_path, journal
 from .telegram import send_document
 
 # Enable logging
@@ -80,7 +80,8 @@ def receive_count(client: Client, message: Message, data: str) -> bool:
             time = get_now() - eval(f"glovar.{word_type}_words")[word]["time"]
             eval(f"glovar.{word_type}_words")[word]["average"] = total / (time / 86400)
 
-        save(f"{word_type}_words")
+        glovar.stats[word_type] += 1
+        journal(f"{word_type}_words", {word: eval(f"glovar.{word_type}_words")[word] for word in the_set})
 
         return True
     except Exception as e:
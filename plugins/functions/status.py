@@ -0,0 +1,75 @@
+# SCP-079-REGEX - Manage regex patterns
+# Copyright (C) 2019-2020 SCP-079 <https://scp-079.org>
+#
+# This file is part of SCP-079-REGEX.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from collections.abc import MutableMapping
+from time import time
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+# This module is imported by glovar, it must not use glovar
+
+# The fields of a word status and their default values, glovar shares this dict
+default_word_status: Dict[str, Union[float, int]] = {
+    "time": int(time()),
+    "average": 0.0,
+    "today": 0,
+    "total": 0,
+    "temp": 0,
+    "who": 0,
+    "cost": 0.0
+}
+
+
+class WordStatus(MutableMapping):
+    # The status of a word, it is used like a dict of the fields but has no per-instance dict
+
+    __slots__ = tuple(default_word_status)
+
+    def __init__(self, status: Optional[dict] = None) -> None:
+        status = status or {}
+
+        for key in default_word_status:
+            setattr(self, key, status.get(key, default_word_status[key]))
+
+    def __delitem__(self, key: str) -> None:
+        raise TypeError("The fields of a word status can not be deleted")
+
+    def __getitem__(self, key: str) -> Union[float, int]:
+        if key not in default_word_status:
+            raise KeyError(key)
+
+        return getattr(self, key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(default_word_status)
+
+    def __len__(self) -> int:
+        return len(default_word_status)
+
+    def __reduce__(self) -> Tuple[type, Tuple[List[Tuple[str, Union[float, int]]]]]:
+        # Pickle as a plain dict, so the data files and the shared files keep their format
+        return dict, ([(key, getattr(self, key)) for key in default_word_status],)
+
+    def __repr__(self) -> str:
+        return repr(dict(self.items()))
+
+    def __setitem__(self, key: str, value: Union[float, int]) -> None:
+        if key not in default_word_status:
+            raise KeyError(key)
+
+        setattr(self, key, value)
+
@@ -0,0 +1,118 @@
+# SCP-079-REGEX - Manage regex patterns
+# Copyright (C) 2019-2020 SCP-079 <https://scp-079.org>
+#
+# This file is part of SCP-079-REGEX.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import logging
+from typing import List, Optional
+
+from .. import glovar
+
+# Enable logging
+logger = logging.getLogger(__name__)
+
+
+def get_stored_order(word_type: str, desc: bool) -> List[str]:
+    # Get the words of a type sorted by the average usage
+    result = []
+    try:
+        with glovar.locks["store"]:
+            cursor = glovar.database.execute(
+                f"SELECT rule FROM words WHERE type = ? ORDER BY average {desc and 'DESC' or 'ASC'}, rule",
+                (word_type,)
+            )
+            result = [row[0] for row in cursor]
+    except Exception as e:
+        logger.warning(f"Get stored order error: {e}", exc_info=True)
+
+    return result
+
+
+def get_stored_temp(word_type: str, limit: int) -> List[str]:
+    # Get the words of a type that have not been used for the limit days
+    result = []
+    try:
+        with glovar.locks["store"]:
+            cursor = glovar.database.execute(
+                "SELECT rule FROM words WHERE type = ? AND temp >= ?",
+                (word_type, limit)
+            )
+            result = [row[0] for row in cursor]
+    except Exception as e:
+        logger.warning(f"Get stored temp error: {e}", exc_info=True)
+
+    return result
+
+
+def is_stored(file: str) -> bool:
+    # Check if a data file is kept in the database
+    try:
+        return bool(glovar.database) and file.endswith("_words") and file[:-6] in glovar.regex
+    except Exception as e:
+        logger.warning(f"Is stored error: {e}", exc_info=True)
+
+    return False
+
+
+def reset_stored_count() -> bool:
+    # Reset the daily usage of all words
+    try:
+        with glovar.locks["store"], glovar.database:
+            glovar.database.execute("UPDATE words SET temp = CASE WHEN today = 0 THEN temp + 1 ELSE 0 END, today = 0")
+
+        return True
+    except Exception as e:
+        logger.warning(f"Reset stored count error: {e}", exc_info=True)
+
+    return False
+
+
+def reset_stored_words(word_type: Optional[str] = None) -> bool:
+    # Reset the status of the words of a type, or of all types, but keep the cost
+    try:
+        status = [glovar.default_word_status[c] for c in glovar.default_word_status if c != "cost"]
+        sql = "UPDATE words SET time = ?, average = ?, today = ?, total = ?, temp = ?, who = ?"
+
+        with glovar.locks["store"], glovar.database:
+            if word_type:
+                glovar.database.execute(f"{sql} WHERE type = ?", (*status, word_type))
+            else:
+                glovar.database.execute(sql, status)
+
+        return True
+    except Exception as e:
+        logger.warning(f"Reset stored words error: {e}", exc_info=True)
+
+    return False
+
+
+def update_stored(word_type: str, changes: dict) -> bool:
+    # Write the changed words of a type to the database, use None as the status of a removed word
+    try:
+        removed = [(word_type, word) for word in changes if changes[word] is None]
+        updated = [(word_type, word, *[status.get(c, glovar.default_word_status[c])
+                                       for c in glovar.default_word_status])
+                   for word, status in changes.items() if status is not None]
+
+        with glovar.locks["store"], glovar.database:
+            glovar.database.executemany("DELETE FROM words WHERE type = ? AND rule = ?", removed)
+            glovar.database.executemany("INSERT OR REPLACE INTO words VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", updated)
+
+        return True
+    except Exception as e:
+        logger.warning(f"Update stored error: {e}", exc_info=True)
+
+    return False
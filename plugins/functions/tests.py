@@ -18,16 +18,14 @@
 
 import logging
 import re
-from copy import deepcopy
 from string import ascii_lowercase
 
 from pyrogram import Client, Message
 
 from .. import glovar
 from .etc import code, get_filename, get_forward_name, get_int, get_text, lang, mention_id, t2t, thread
-from .filters import is_regex_text
+from .engine import get_type_matches
 from .telegram import get_sticker_title, send_message
-from .words import is_similar
 
 # Enable logging
 logger = logging.getLogger(__name__)
@@ -46,11 +44,14 @@ def name_test(client: Client, message: Message) -> bool:
         mid = message.message_id
         result = ""
 
-        for word_type in ["ad", "con", "iml", "nm", "wb", "test"]:
-            if not is_regex_text(word_type, text):
+        type_matches = get_type_matches(text, ["ad", "con", "iml", "nm", "wb", "test"])
+
+        for word_type in type_matches:
+            w_list = type_matches[word_type]
+
+            if not w_list:
                 continue
 
-            w_list = [w for w in deepcopy(eval(f"glovar.{word_type}_words")) if is_similar("test", w, text)]
             result += "\t" * 4 + f"{lang(word_type)}：" + "-" * 16 + "\n\n"
 
             for w in w_list:
@@ -85,12 +86,14 @@ def sticker_test(client: Client, message: Message) -> bool:
         sticker_name = message.sticker.set_name
         result += f"{lang('sticker_name')}{lang('colon')}{code(sticker_name)}\n\n"
 
-        for word_type in ["sti", "test"]:
-            if not is_regex_text(word_type, sticker_name):
+        type_matches = get_type_matches(sticker_name, ["sti", "test"])
+
+        for word_type in type_matches:
+            w_list = type_matches[word_type]
+
+            if not w_list:
                 continue
 
-            w_list = [w for w in deepcopy(eval(f"glovar.{word_type}_words"))
-                      if is_similar("test", w, sticker_name)]
             result += "\t" * 4 + f"{lang(word_type)}：" + "-" * 16 + "\n\n"
 
             for w in w_list:
@@ -100,12 +103,14 @@ def sticker_test(client: Client, message: Message) -> bool:
         result += f"{lang('sticker_title')}{lang('colon')}{code(sticker_title)}\n\n"
         sticker_title = t2t(sticker_title, True, True)
 
-        for word_type in ["ad", "con", "ban", "sti", "test"]:
-            if not is_regex_text(word_type, sticker_title):
+        type_matches = get_type_matches(sticker_title, ["ad", "con", "ban", "sti", "test"])
+
+        for word_type in type_matches:
+            w_list = type_matches[word_type]
+
+            if not w_list:
                 continue
 
-            w_list = [w for w in deepcopy(eval(f"glovar.{word_type}_words"))
-                      if is_similar("test", w, sticker_title)]
             result += "\t" * 4 + f"{lang(word_type)}：" + "-" * 16 + "\n\n"
 
             for w in w_list:
@@ -154,14 +159,17 @@ def text_test(client: Client, message: Message) -> bool:
         type_set = set(glovar.regex)
         type_list = order_list + list(type_set - order_set)
 
+        type_matches = get_type_matches(text, type_list)
+
         for word_type in type_list:
             if len(result_list[-1]) > 2000:
                 result_list.append("")
 
-            if not is_regex_text(word_type, text):
+            w_list = type_matches.get(word_type, [])
+
+            if not w_list:
                 continue
 
-            w_list = [w for w in deepcopy(eval(f"glovar.{word_type}_words")) if is_similar("test", w, text)]
             result_list[-1] += f"{lang(word_type)}：" + "-" * 24 + "\n\n"
 
             for w in w_list:
@@ -23,10 +23,12 @@ from pyrogram import Client
 
 from .. import glovar
 from .channel import share_data
-from .etc import code, get_now, lang, mention_id, thread
-from .file import save
+from .engine import get_redundant, get_word_flags, remove_pattern
+from .etc import code, get_now, italic, lang, mention_id, thread
+from .file import journal, save, save_thread
+from .store import get_stored_temp, is_stored, reset_stored_count
 from .telegram import send_message
-from .words import get_comments, words_ask
+from .words import words_ask
 
 # Enable logging
 logger = logging.getLogger(__name__)
@@ -40,6 +42,10 @@ def backup_files(client: Client) -> bool:
             if not eval(f"glovar.{file}"):
                 continue
 
+            # Compact, or take a snapshot of the words in the database
+            if glovar.journals.get(file) or is_stored(file):
+                save_thread(file)
+
             # Share
             share_data(
                 client=client,
@@ -58,6 +64,46 @@ def backup_files(client: Client) -> bool:
     return False
 
 
+def cluster_words(client: Client) -> bool:
+    # Report the redundant words of each word type
+    try:
+        for word_type in glovar.regex:
+            redundant = get_redundant(word_type)
+
+            if not redundant:
+                continue
+
+            redundant_units = [(word, w) for word in redundant for w in redundant[word]]
+            redundant_units_list = [redundant_units[i:i + glovar.per_page]
+                                    for i in range(0, len(redundant_units), glovar.per_page)]
+
+            for units in redundant_units_list:
+                words = {}
+
+                for word, w in units:
+                    words.setdefault(word, []).append(w)
+
+                end_text = "\n\n".join(code(word) + "".join(f"\n{italic(lang('contains'))}{lang('colon')}{code(w)}"
+                                                              for w in words[word])
+                                         for word in words)
+                text = (f"{lang('action')}{lang('colon')}{code(lang('action_cluster'))}\n"
+                        f"{lang('type')}{lang('colon')}{code(lang(word_type))}\n")
+
+                if glovar.comments.get(word_type):
+                    text += f"{lang('comment')}{lang('colon')}{code(glovar.comments[word_type])}\n"
+
+                text += f"{lang('redundant')}{lang('colon')}" + "-" * 24 + f"\n\n{end_text}\n"
+
+                thread(send_message, (client, glovar.regex_group_id, text))
+                sleep(3)
+
+        return True
+    except Exception as e:
+        logger.warning(f"Cluster words error: {e}", exc_info=True)
+
+    return False
+
+
 def interval_hour_01(client: Client) -> bool:
     # Execute every hour
     try:
@@ -92,6 +138,9 @@ def reset_count(client: Client) -> bool:
     # Reset the daily usage
     glovar.locks["regex"].acquire()
     try:
+        if glovar.database:
+            reset_stored_count()
+
         for word_type in glovar.regex:
             deleted_words = {}
 
@@ -104,16 +153,29 @@ def reset_count(client: Client) -> bool:
                 else:
                     eval(f"glovar.{word_type}_words")[word]["temp"] = 0
 
-                comments = get_comments(word)
+            glovar.stats[word_type] += 1
+
+            # Get the words that have not been used for the limit days
+            if glovar.database:
+                temp_words = get_stored_temp(word_type, glovar.limit_temp)
+            else:
+                temp_words = [word for word in eval(f"glovar.{word_type}_words")
+                              if eval(f"glovar.{word_type}_words")[word]["temp"] >= glovar.limit_temp]
+
+            for word in temp_words:
+                flags = get_word_flags(word_type, word)
 
-                if (not any("temp" in comment for comment in comments)
-                        and not (word_type == "ban" and not any("forever" in comment for comment in comments))):
+                if (not flags & glovar.bits["temp"]
+                        and not (word_type == "ban" and not flags & glovar.bits["forever"])):
                     continue
 
-                if eval(f"glovar.{word_type}_words")[word]["temp"] >= glovar.limit_temp:
-                    deleted_words[word] = eval(f"glovar.{word_type}_words").pop(word, {})
+                deleted_words[word] = eval(f"glovar.{word_type}_words").pop(word, {})
+                remove_pattern(word_type, word)
 
-            save(f"{word_type}_words")
+            if glovar.database:
+                journal(f"{word_type}_words", {word: None for word in deleted_words})
+            else:
+                save(f"{word_type}_words")
 
             if not deleted_words:
                 continue
@@ -21,28 +21,36 @@ import re
 from copy import deepcopy
 from json import dumps
 from string import ascii_lowercase
-from typing import List, Optional, Set
+from typing import List, Optional, Set, Tuple
 
 from pyrogram import Client, InlineKeyboardMarkup, InlineKeyboardButton, Message
 
 from .. import glovar
 from .channel import share_regex_update
-from .etc import code, button_data, get_command_context, get_int, get_list_page, get_now, get_text, italic, lang
-from .etc import mention_id, random_str, thread
-from .file import save, save_thread
+from .engine import add_pattern, get_bank, get_cost, get_pattern, get_search_candidates, get_search_samples
+from .engine import get_similar, get_similar_words, remove_pattern
+from .etc import add_session, code, button_data, get_command_context, get_int, get_list_page, get_now
+from .etc import get_session, get_text, italic, lang, mention_id, random_str, thread
+from .file import journal, save
 from .filters import is_similar
+from .status import WordStatus
+from .store import get_stored_order
 from .telegram import send_message
 
 # Enable logging
 logger = logging.getLogger(__name__)
 
 
-def add_word(word_type: str, word: str, aid: int) -> bool:
+def add_word(word_type: str, word: str, aid: int, cost: float = 0.0, bank: List[str] = None) -> bool:
     # Add a word
     try:
-        eval(f"glovar.{word_type}_words")[word] = deepcopy(glovar.default_word_status)
+        eval(f"glovar.{word_type}_words")[word] = WordStatus(glovar.default_word_status)
         eval(f"glovar.{word_type}_words")[word]["who"] = aid
-        save_thread(f"{word_type}_words")
+        eval(f"glovar.{word_type}_words")[word]["cost"] = cost
+        add_pattern(word_type, word)
+        glovar.samples[word_type][word] = bank if bank is not None else get_bank(word)
+        journal(f"{word_type}_words", {word: eval(f"glovar.{word_type}_words")[word]})
+        journal("samples", {(word_type, word): glovar.samples[word_type][word]})
 
         return True
     except Exception as e:
@@ -142,31 +150,23 @@ def get_duplicated(word_type: str, word: str) -> Set[str]:
     # Get duplicated word types
     result = set()
     try:
+        word_types = glovar.rule_types.get(word, set())
+
+        if not word_types:
+            return set()
+
         if word_type in {f"ad{c}" for c in ascii_lowercase}:
             word_type = "ad_"
 
-        # Current word type as parent
-        for w_t in glovar.contains.get(word_type, set()):
-            if w_t == "ad_":
-                for c in ascii_lowercase:
-                    if word in eval(f"glovar.ad{c}_words"):
-                        result.add(f"ad{c}")
-            else:
-                if word in eval(f"glovar.{w_t}_words"):
-                    result.add(w_t)
-
-        # Current word type as child
-        for w_t in glovar.contains:
-            if word_type not in glovar.contains[w_t]:
-                continue
+        # Current word type as parent, then as child
+        related = set(glovar.contains.get(word_type, set()))
+        related.update(w_t for w_t in glovar.contains if word_type in glovar.contains[w_t])
 
+        for w_t in related:
             if w_t == "ad_":
-                for c in ascii_lowercase:
-                    if word in eval(f"glovar.ad{c}_words"):
-                        result.add(f"ad{c}")
-            else:
-                if word in eval(f"glovar.{w_t}_words"):
-                    result.add(w_t)
+                result.update(f"ad{c}" for c in ascii_lowercase if f"ad{c}" in word_types)
+            elif w_t in word_types:
+                result.add(w_t)
     except Exception as e:
         logger.warning(f"Get duplicated error: {e}", exc_info=True)
 
@@ -176,11 +176,16 @@ def get_duplicated(word_type: str, word: str) -> Set[str]:
 def get_match(mode: str, regex: str, text: str) -> str:
     # Get match result
     try:
+        pattern = get_pattern(regex)
+
+        if not pattern:
+            return "None"
+
         if mode == "findall":
-            match = re.findall(regex, text, re.I | re.M | re.S)
+            match = pattern.findall(text)
             return str(match)
         else:
-            match = re.search(regex, text, re.I | re.M | re.S)
+            match = pattern.search(text)
 
             if not match:
                 return "None"
@@ -222,9 +227,11 @@ def remove_word(word_type: str, words: List[str], aid: int) -> Set[int]:
     try:
         for word in words:
             word_status = eval(f"glovar.{word_type}_words").pop(word, {})
+            remove_pattern(word_type, word)
             result.add(word_status.get("who"))
 
-        save_thread(f"{word_type}_words")
+        journal(f"{word_type}_words", {word: None for word in words})
+        journal("samples", {(word_type, word): None for word in words})
         result.discard(aid)
         result = {cc_id for cc_id in list(result) if cc_id}
     except Exception as e:
@@ -319,25 +326,75 @@ def word_add(client: Client, message: Message) -> (str, InlineKeyboardMarkup):
                          f"{lang('reason')}{lang('colon')}{code(lang('reason_not_specific'))}\n")
                 return text, markup
 
-        # Check similar patterns
+        # Check if the pattern backtracks catastrophically
+        cost = get_cost(word)
+
+        if cost is None:
+            text += (f"{lang('status')}{lang('colon')}{code(lang('status_failed'))}\n"
+                     f"{lang('reason')}{lang('colon')}{code(lang('reason_backtracking'))}\n")
+            return text, markup
+
+        if cost is False:
+            text += (f"{lang('status')}{lang('colon')}{code(lang('status_failed'))}\n"
+                     f"{lang('reason')}{lang('colon')}{code(lang('reason_unverified'))}\n")
+            return text, markup
+
+        text += f"{lang('cost')}{lang('colon')}{code(f'{cost[0]:.4f}s')}"
+        text += f" {italic(lang('super_linear'))}\n" if cost[1] else "\n"
+
+        # Check similar patterns in a snapshot of the word type without holding the lock
+        bank = get_bank(word)
+        words = list(eval(f"glovar.{word_type}_words"))
+        similar = set(get_similar_words(word_type, word, bank, words))
+
+        with glovar.locks["regex"]:
+            # Check the words that were changed while scanning
+            if eval(f"glovar.{word_type}_words").get(word, {}):
+                text += (f"{lang('status')}{lang('colon')}{code(lang('status_failed'))}\n"
+                         f"{lang('reason')}{lang('colon')}{code(lang('reason_existed'))}\n")
+                return text, markup
+
+            duplicated_list = get_duplicated(word_type, word)
+
+            if duplicated_list:
+                end_text = "\t" * 4 + italic(lang("comma")).join(italic(lang(d)) for d in duplicated_list)
+                text += (f"{lang('status')}{lang('colon')}{code(lang('status_failed'))}\n"
+                         f"{lang('reason')}{lang('colon')}{code(lang('reason_duplicated'))}\n"
+                         f"{lang('duplicated')}{lang('colon')}" + "-" * 24 + f"\n\n{end_text}\n")
+                return text, markup
+
+            snapshot = set(words)
+            words = list(eval(f"glovar.{word_type}_words"))
+            similar.update(get_similar(word_type, word, bank, [w for w in words if w not in snapshot]))
+
+            text, markup = word_add_insert(client, text, aid, word_type, word, cost, bank,
+                                           [w for w in words if w in similar])
+    except Exception as e:
+        logger.warning(f"Word add error: {e}", exc_info=True)
+
+    return text, markup
+
+
+def word_add_insert(client: Client, text: str, aid: int, word_type: str, word: str, cost: Tuple[float, bool],
+                    bank: List[str], similar: List[str]) -> (str, InlineKeyboardMarkup):
+    # Ask about the similar words or insert the word, it should be called with the regex lock
+    markup = None
+    try:
         key = random_str(8)
 
         while glovar.ask_words.get(key):
             key = random_str(8)
 
-        glovar.ask_words[key] = {
+        add_session("ask_words", key, {
             "lock": False,
             "time": get_now(),
             "admin": aid,
             "mid": 0,
             "new": word,
-            "old": [],
-            "type": word_type
-        }
-
-        for old in list(eval(f"glovar.{word_type}_words")):
-            if is_similar("strict", old, word):
-                glovar.ask_words[key]["old"].append(old)
+            "old": similar,
+            "type": word_type,
+            "cost": cost[0]
+        })
 
         if glovar.ask_words[key]["old"]:
             end_text = "\n\n".join(code(w) for w in glovar.ask_words[key]["old"])
@@ -373,11 +430,11 @@ def word_add(client: Client, message: Message) -> (str, InlineKeyboardMarkup):
             save("ask_words")
         else:
             glovar.ask_words.pop(key, None)
-            add_word(word_type, word, aid)
+            add_word(word_type, word, aid, cost[0], bank)
             share_regex_update(client, word_type)
             text += f"{lang('status')}{lang('colon')}{code(lang('status_succeeded'))}\n"
     except Exception as e:
-        logger.warning(f"Word add error: {e}", exc_info=True)
+        logger.warning(f"Word add insert error: {e}", exc_info=True)
 
     return text, markup
 
@@ -405,6 +462,7 @@ def words_ask(client: Client, operation: str, key: str) -> (str, Set[int]):
         word_type = glovar.ask_words[key]["type"]
         new_word = glovar.ask_words[key]["new"]
         old_words = glovar.ask_words[key]["old"]
+        cost = glovar.ask_words[key].get("cost", 0.0)
 
         # Word type info text
         text += f"{lang('type')}{lang('colon')}{code(lang(word_type))}\n"
@@ -419,7 +477,7 @@ def words_ask(client: Client, operation: str, key: str) -> (str, Set[int]):
 
         # If admin decide to add new word
         if operation == "new":
-            add_word(word_type, new_word, aid)
+            add_word(word_type, new_word, aid, cost)
             share_regex_update(client, word_type)
             text = (f"{lang('action')}{lang('colon')}{code(lang('ask_new'))}\n"
                     f"{text}"
@@ -428,7 +486,7 @@ def words_ask(client: Client, operation: str, key: str) -> (str, Set[int]):
 
         # Delete old words
         elif operation == "replace":
-            add_word(word_type, new_word, aid)
+            add_word(word_type, new_word, aid, cost)
             cc_list = remove_word(word_type, old_words, aid)
             share_regex_update(client, word_type)
             text = (f"{lang('action')}{lang('colon')}{code(lang('ask_replace'))}\n"
@@ -528,19 +586,35 @@ def words_list_page(aid: int, word_type: str, page: int, desc: bool) -> (str, In
         text = (f"{lang('admin')}{lang('colon')}{mention_id(aid)}\n"
                 f"{lang('action')}{lang('colon')}{code(lang('action_list'))}\n")
 
-        # Get words
+        # Get words, they are only sorted again when the words or their statistics are changed
         words = eval(f"glovar.{word_type}_words")
-        keys = list(words.keys())
-        keys.sort()
-        w_list = sorted(keys, key=lambda k: words[k]["average"], reverse=desc)
+        key = f"{word_type} {desc and 'desc' or 'asc'}"
+        session = get_session("result_list", key)
+
+        if (not session
+                or session["version"] != glovar.versions[word_type]
+                or session["stats"] != glovar.stats[word_type]):
+            if glovar.database:
+                w_list = tuple(get_stored_order(word_type, desc))
+            else:
+                w_list = tuple(sorted(sorted(words), key=lambda k: words[k]["average"], reverse=desc))
 
-        # Get the list and generate the markup
-        if w_list:
-            per_page = min(4000 // max(len(w) for w in w_list), glovar.per_page) or 1
-        else:
-            per_page = glovar.per_page
+            if w_list:
+                per_page = min(4000 // max(len(w) for w in w_list), glovar.per_page) or 1
+            else:
+                per_page = glovar.per_page
 
-        w_list, markup = get_list_page(w_list, "list", word_type, page, per_page)
+            session = {
+                "version": glovar.versions[word_type],
+                "stats": glovar.stats[word_type],
+                "result": w_list,
+                "per_page": per_page
+            }
+            add_session("result_list", key, session)
+
+        # Get the list and generate the markup
+        w_list, markup = get_list_page(session["result"], "list", word_type, page, session["per_page"])
+        w_list = [w for w in w_list if w in words]
 
         # Generate the text
         end_text = f"\n\n".join((f"{code(w)}\n"
@@ -702,31 +776,31 @@ def words_search(message: Message, mode: str) -> (str, InlineKeyboardMarkup):
         while key in glovar.result_search:
             key = random_str(8)
 
-        glovar.result_search[key] = {
-            "result": {},
-            "type": word_type,
-            "word": word,
-            "mode": mode
-        }
-
-        # Get the result
-        result = {}
+        # Get the result, only check the candidates found by the index if there are any
+        candidates = get_search_candidates(mode, word)
 
         if word_type == "all":
-            for n in glovar.regex:
-                for w in eval(f"glovar.{n}_words"):
-                    if not is_similar(mode, w, word):
-                        continue
+            words = list(glovar.rule_types)
+        else:
+            words = list(eval(f"glovar.{word_type}_words"))
 
-                    if result.get(w) is None:
-                        result[w] = []
+        result = {w for w in words if (candidates is None or w in candidates) and is_similar(mode, w, word)}
 
-                    result[w].append(n)
-        else:
-            result = {w: [] for w in eval(f"glovar.{word_type}_words")
-                      if is_similar(mode, w, word)}
+        # The index only knows the text of the words, the other words may still be found by their samples
+        if mode == "search" and candidates is not None:
+            others = {w: glovar.rule_types.get(w, set()) if word_type == "all" else {word_type}
+                      for w in words if w not in candidates}
+            result |= get_search_samples(word, others)
 
-        glovar.result_search[key]["result"] = result
+        result = tuple(sorted(result))
+
+        # Only keep the found words, the word types are looked up when the page is shown
+        add_session("result_search", key, {
+            "result": result,
+            "type": word_type,
+            "word": word,
+            "mode": mode
+        })
         text, markup = words_search_page(aid, key, 1)
     except Exception as e:
         logger.warning(f"Words search error: {e}", exc_info=True)
@@ -743,14 +817,16 @@ def words_search_page(aid: int, key: str, page: int) -> (str, InlineKeyboardMark
         text = (f"{lang('admin')}{lang('colon')}{mention_id(aid)}\n"
                 f"{lang('action')}{lang('colon')}{code(lang('action_search'))}\n")
 
-        if key not in glovar.result_search:
+        session = get_session("result_search", key)
+
+        if not session:
             text += (f"{lang('status')}{lang('colon')}{code(lang('status_failed'))}\n"
                      f"{lang('reason')}{lang('colon')}{code(lang('expired'))}\n")
             return text, markup
 
-        word_type = glovar.result_search[key]["type"]
-        word = glovar.result_search[key]["word"]
-        mode = glovar.result_search[key]["mode"]
+        word_type = session["type"]
+        word = session["word"]
+        mode = session["mode"]
 
         text += f"{lang('mode')}{lang('colon')}{code(lang(mode))}\n"
         text += f"{lang('type')}{lang('colon')}{code(glovar.lang.get(word_type, lang('all')))}\n"
@@ -760,24 +836,23 @@ def words_search_page(aid: int, key: str, page: int) -> (str, InlineKeyboardMark
 
         text += f"{lang('word')}{lang('colon')}{code(word)}\n"
 
-        words = glovar.result_search[key]["result"]
+        words = session["result"]
 
         if not words:
             text += (f"{lang('status')}{lang('colon')}{code(lang('status_failed'))}\n"
                      f"{lang('reason')}{lang('colon')}{code(lang('reason_not_found'))}\n")
             return text, markup
 
-        w_list = list(words)
-        w_list.sort()
-        w_list, markup = get_list_page(w_list, "search", key, page)
+        # The words are sorted when the session is created
+        w_list, markup = get_list_page(words, "search", key, page)
 
         # Get the result text
         if word_type == "all":
-            result = glovar.result_search[key]['result']
+            types = {w: glovar.rule_types.get(w, set()) for w in w_list}
             end_text = "\n\n".join(f"{code(w)}\n\n"
                                    + "\t" * 4
-                                   + italic(lang('comma').join(lang(t) for t in result[w]))
-                                   for w in w_list)
+                                   + italic(lang('comma').join(lang(t) for t in glovar.regex if t in types[w]))
+                                   for w in w_list if types[w])
         else:
             words = eval(f"glovar.{word_type}_words")
             end_text = "\n\n".join((f"{code(w)}\n"
@@ -785,10 +860,80 @@ def words_search_page(aid: int, key: str, page: int) -> (str, InlineKeyboardMark
                                     f"{italic(words[w]['today'])} {code('/')} "
                                     f"{italic(words[w]['total'])} {code('/')} "
                                     f"{italic(words[w]['temp'])}")
-                                   for w in w_list)
+                                   for w in w_list if w in words)
 
         text += f"{lang('result')}{lang('colon')}" + "-" * 24 + f"\n\n{end_text}"
     except Exception as e:
         logger.warning(f"Words search page error: {e}", exc_info=True)
 
     return text, markup
+
+
+def words_slow(message: Message) -> (str, InlineKeyboardMarkup):
+    # List the slowest words of a word type
+    text = ""
+    markup = None
+    try:
+        # Basic data
+        aid = message.from_user.id
+
+        # Text prefix
+        text = (f"{lang('admin')}{lang('colon')}{mention_id(aid)}\n"
+                f"{lang('action')}{lang('colon')}{code(lang('action_slow'))}\n")
+
+        command_list = list(filter(None, get_text(message).split(" ")))
+
+        # Check command format
+        if len(command_list) <= 1 or command_list[1] not in glovar.regex:
+            text += (f"{lang('status')}{lang('colon')}{code(lang('status_failed'))}\n"
+                     f"{lang('reason')}{lang('colon')}{code(lang('command_usage'))}\n")
+            return text, markup
+
+        text, markup = words_slow_page(aid, command_list[1], 1)
+    except Exception as e:
+        logger.warning(f"Words slow error: {e}", exc_info=True)
+
+    return text, markup
+
+
+def words_slow_page(aid: int, word_type: str, page: int) -> (str, InlineKeyboardMarkup):
+    # Generate a slowest words page
+    text = ""
+    markup = None
+    try:
+        # Text prefix
+        text = (f"{lang('admin')}{lang('colon')}{mention_id(aid)}\n"
+                f"{lang('action')}{lang('colon')}{code(lang('action_slow'))}\n")
+
+        # Get words
+        profiles = deepcopy(glovar.profiles.get(word_type, {}))
+        w_list = sorted(profiles, key=lambda k: profiles[k]["total"], reverse=True)
+
+        # Get the list and generate the markup
+        if w_list:
+            per_page = min(4000 // max(len(w) for w in w_list), glovar.per_page) or 1
+        else:
+            per_page = glovar.per_page
+
+        w_list, markup = get_list_page(w_list, "slow", word_type, page, per_page)
+
+        # Generate the text
+        end_text = f"\n\n".join((f"{code(w)}\n"
+                                 f"{italic(round(profiles[w]['total'] * 1000, 2))} {code('ms /')} "
+                                 f"{italic(round(profiles[w]['worst'] * 1000, 2))} {code('ms /')} "
+                                 f"{italic(profiles[w]['count'])}")
+                                for w in w_list)
+
+        text += f"{lang('type')}{lang('colon')}{code(lang(word_type))}\n"
+
+        if glovar.comments.get(word_type):
+            text += f"{lang('comment')}{lang('colon')}{code(glovar.comments[word_type])}\n"
+
+        if not end_text.strip():
+            end_text = code(lang("reason_none"))
+
+        text += f"{lang('result')}{lang('colon')}" + "-" * 24 + f"\n\n{end_text}\n"
+    except Exception as e:
+        logger.warning(f"Words slow page error: {e}", exc_info=True)
+
+    return text, markup
@@ -0,0 +1,173 @@
+# SCP-079-REGEX - Manage regex patterns
+# Copyright (C) 2019-2020 SCP-079 <https://scp-079.org>
+#
+# This file is part of SCP-079-REGEX.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import logging
+import re
+from multiprocessing import Pipe
+from multiprocessing.connection import Connection
+from os import _exit, fork, kill, waitpid
+from signal import SIGKILL
+from time import perf_counter
+from typing import Dict, List, Pattern, Tuple
+
+# Enable logging
+logger = logging.getLogger(__name__)
+
+# This module runs in the worker processes, it must not use glovar
+
+snapshots: Dict[str, Tuple[int, Dict[str, Pattern]]] = {}
+# snapshots = {
+#     "type": (1, {"regex": re.compile("regex", re.I | re.M | re.S)})
+# }
+
+
+def init_snapshots(versions: Dict[str, int], rules: Dict[str, List[str]]) -> bool:
+    # Initialize the snapshots when a worker process starts
+    try:
+        for word_type in rules:
+            update_snapshot(word_type, versions[word_type], rules[word_type])
+
+        return True
+    except Exception as e:
+        logger.warning(f"Init snapshots error: {e}", exc_info=True)
+
+    return False
+
+
+def measure_costs(word: str, pumps: List[str], conn: Connection) -> bool:
+    # Measure the search time of a word with the inputs made of the pumps, send each result as soon as it is known
+    try:
+        pattern = re.compile(word, re.I | re.M | re.S)
+
+        for pump in pumps:
+            count = 1
+
+            while len(pump) * count <= 4096:
+                text = pump * count + "\x00"
+                start = perf_counter()
+                pattern.search(text)
+                cost = perf_counter() - start
+                conn.send((pump, len(text), cost))
+
+                # Enough to know the growth
+                if cost > 0.05:
+                    break
+
+                count *= 2
+
+        conn.send(None)
+
+        return True
+    except Exception as e:
+        logger.warning(f"Measure costs error: {e}", exc_info=True)
+
+    return False
+
+
+def serve_costs(conn: Connection) -> bool:
+    # Measure each received word in a forked child process and pass the results on,
+    # send False instead of None if an input runs out of time, the server is started before any thread
+    try:
+        while True:
+            word, pumps, timeout = conn.recv()
+            receiver, sender = Pipe(False)
+            pid = fork()
+
+            if pid == 0:
+                receiver.close()
+                measure_costs(word, pumps, sender)
+                _exit(0)
+
+            sender.close()
+            finished = False
+
+            try:
+                while not finished and receiver.poll(timeout):
+                    item = receiver.recv()
+                    finished = item is None
+                    conn.send(item)
+            except EOFError:
+                pass
+
+            if not finished:
+                kill(pid, SIGKILL)
+                conn.send(False)
+
+            waitpid(pid, 0)
+            receiver.close()
+    except EOFError:
+        return True
+    except Exception as e:
+        logger.warning(f"Serve costs error: {e}", exc_info=True)
+
+    return False
+
+
+def search_words(task: Tuple[Dict[str, int], List[Tuple[str, str]], List[str],
+                             Dict[str, List[str]]]) -> Tuple[List[str], List[str], List[Tuple[str, str, float]]]:
+    # Search the texts with the words in a worker process,
+    # return the hit words, the out of date word types and the search time of each word
+    result = ([], [], [])
+    try:
+        versions, items, texts, rules = task
+
+        for word_type in rules:
+            update_snapshot(word_type, versions[word_type], rules[word_type])
+
+        stale = [w_t for w_t in versions if snapshots.get(w_t, (-1, {}))[0] != versions[w_t]]
+
+        if stale:
+            return [], stale, []
+
+        for word_type, word in items:
+            pattern = snapshots[word_type][1].get(word)
+
+            if not pattern:
+                continue
+
+            start = perf_counter()
+            hit = any(pattern.search(text) for text in texts)
+            result[2].append((word_type, word, perf_counter() - start))
+
+            if hit:
+                result[0].append(word)
+    except Exception as e:
+        logger.warning(f"Search words error: {e}", exc_info=True)
+
+    return result
+
+
+def update_snapshot(word_type: str, version: int, rules: List[str]) -> bool:
+    # Update the snapshot of a word type, keep the patterns that are already compiled
+    try:
+        old = snapshots.get(word_type, (-1, {}))[1]
+        patterns = {}
+
+        for rule in rules:
+            try:
+                patterns[rule] = old.get(rule) or re.compile(rule, re.I | re.M | re.S)
+            except Exception as e:
+                logger.warning(f"Compile {word_type} rule {rule} error: {e}", exc_info=True)
+
+        snapshots[word_type] = (version, patterns)
+
+        return True
+    except Exception as e:
+        logger.warning(f"Update snapshot error: {e}", exc_info=True)
+
+    return False
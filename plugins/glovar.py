@@ -18,14 +18,20 @@
 
 import logging
 import pickle
+import sqlite3
+from collections import OrderedDict
 from configparser import RawConfigParser
+from multiprocessing.connection import Connection
+from multiprocessing.pool import Pool
 from os import mkdir
 from os.path import exists
 from shutil import rmtree
 from string import ascii_lowercase
-from threading import Lock
+from threading import Lock, RLock
 from time import time
-from typing import Dict, List, Set, Union
+from typing import Dict, List, Optional, Pattern, Set, Tuple, Union
+
+from .functions.status import WordStatus, default_word_status
 
 # Enable logging
 logging.basicConfig(
@@ -55,10 +61,16 @@ test_group_id: int = 0
 aio: Union[bool, str] = ""
 backup: Union[bool, str] = ""
 date_reset: str = ""
+limit_cache: int = 0
+limit_journal: int = 0
+limit_similar: int = 0
 limit_temp: int = 0
 per_page: int = 0
+processes: int = 0
 project_link: str = ""
 project_name: str = ""
+save_interval: int = 0
+sqlite: Union[bool, str] = "False"
 zh_cn: Union[bool, str] = ""
 
 # [encrypt]
@@ -87,10 +99,17 @@ try:
     backup = config["custom"].get("backup", backup)
     backup = eval(backup)
     date_reset = config["custom"].get("date_reset", date_reset)
+    limit_cache = int(config["custom"].get("limit_cache", str(limit_cache)))
+    limit_journal = int(config["custom"].get("limit_journal", str(limit_journal)))
+    limit_similar = int(config["custom"].get("limit_similar", str(limit_similar)))
     limit_temp = int(config["custom"].get("limit_temp", str(limit_temp)))
     per_page = int(config["custom"].get("per_page", str(per_page)))
+    processes = int(config["custom"].get("processes", str(processes)))
     project_link = config["custom"].get("project_link", project_link)
     project_name = config["custom"].get("project_name", project_name)
+    save_interval = int(config["custom"].get("save_interval", str(save_interval)))
+    sqlite = config["custom"].get("sqlite", sqlite)
+    sqlite = eval(sqlite)
     zh_cn = config["custom"].get("zh_cn", zh_cn)
     zh_cn = eval(zh_cn)
 
@@ -113,10 +132,16 @@ if (bot_token in {"", "[DATA EXPUNGED]"}
         or aio not in {False, True}
         or backup not in {False, True}
         or date_reset in {"", "[DATA EXPUNGED]"}
+        or limit_cache < 0
+        or limit_journal < 0
+        or limit_similar < 0
         or limit_temp == 0
         or per_page == 0
+        or processes < 0
         or project_link in {"", "[DATA EXPUNGED]"}
         or project_name in {"", "[DATA EXPUNGED]"}
+        or save_interval < 0
+        or sqlite not in {False, True}
         or zh_cn not in {False, True}
         or key in {b"", b"[DATA EXPUNGED]", "", "[DATA EXPUNGED]"}
         or password in {"", "[DATA EXPUNGED]"}):
@@ -206,11 +231,13 @@ lang: Dict[str, str] = {
     "ad_": (zh_cn and "广告 {} 组") or "Ad {}",
     # Special
     "action_add": (zh_cn and "添加规则") or "Add Rule",
+    "action_benchmark": (zh_cn and "基准测试") or "Benchmark",
     "action_cancel": (zh_cn and "取消添加") or "Cancel Add",
     "action_captcha": (zh_cn and "验证未通过数据") or "CAPTCHA Failure Data",
     "action_captcha_request": (zh_cn and "查询验证未通过数据") or "Request CAPTCHA Failure Data",
     "action_cc": (zh_cn and "抄送") or "CC",
     "action_check": (zh_cn and "查询数据") or "Check the Count Data",
+    "action_cluster": (zh_cn and "规则聚类") or "Cluster Rules",
     "action_comment": (zh_cn and "添加备注") or "Add Comment",
     "action_count": (zh_cn and "请求统计") or "Request Statistics",
     "action_escape": (zh_cn and "转义字符") or "Escape",
@@ -223,30 +250,43 @@ lang: Dict[str, str] = {
     "action_reset": (zh_cn and "重置计数") or "Reset Count",
     "action_same": (zh_cn and "复制命令") or "Copy Command",
     "action_search": (zh_cn and "查询规则") or "Search Rules",
+    "action_slow": (zh_cn and "耗时排行") or "Show the Slow Rules",
     "action_who": (zh_cn and "查询添加者") or "Find the Adder",
     "all": (zh_cn and "全部") or "All",
     "ask_new": (zh_cn and "另增新词") or "Add as New",
     "ask_replace": (zh_cn and "替换全部") or "Replace All",
+    "backend": (zh_cn and "引擎") or "Backend",
+    "cache": (zh_cn and "结果缓存") or "Result Cache",
+    "cache_hits": (zh_cn and "缓存命中") or "Cache Hits",
+    "cache_misses": (zh_cn and "缓存未命中") or "Cache Misses",
     "cancel": (zh_cn and "取消") or "Cancel",
     "comment": (zh_cn and "备注") or "Comment",
+    "contains": (zh_cn and "包含") or "Contains",
+    "cost": (zh_cn and "耗时") or "Cost",
     "duplicated": (zh_cn and "重复") or "Duplicated",
     "expired": (zh_cn and "会话已失效") or "Session Expired",
     "find": (zh_cn and "包含搜索") or "Include Search",
+    "found_in": (zh_cn and "所在类别") or "Found In",
+    "mismatches": (zh_cn and "结果不一致") or "Mismatches",
     "mode": (zh_cn and "模式") or "Mode",
     "order": (zh_cn and "顺序") or "Order",
     "order_asc": (zh_cn and "升序") or "Ascending",
     "order_desc": (zh_cn and "降序") or "Descending",
     "query": (zh_cn and "查询") or "Query",
+    "reason_backtracking": (zh_cn and "灾难性回溯") or "Catastrophic Backtracking",
     "reason_duplicated": (zh_cn and "跨类别重复") or "Duplicated",
     "reason_existed": (zh_cn and "已存在") or "Existed",
     "reason_not_exist": (zh_cn and "不存在") or "Does Not Exist",
     "reason_not_found": (zh_cn and "没有找到") or "Not Found",
     "reason_not_specific": (zh_cn and "不具有特殊性") or "Not specific",
+    "reason_unverified": (zh_cn and "无法检测耗时") or "Unable to Verify",
     "reason_wait": (zh_cn and "等待确认") or "Wait for Confirmation",
+    "redundant": (zh_cn and "冗余规则") or "Redundant Rules",
     "removed": (zh_cn and "移除") or "Removed",
     "replaced": (zh_cn and "替换") or "Replaced",
     "s": (zh_cn and "宽松搜索") or "Loose Search",
     "search": (zh_cn and "正则搜索") or "REGEX Search",
+    "super_linear": (zh_cn and "超线性增长") or "Super-linear Growth",
     "t2t": (zh_cn and "文字转换") or "Text Transfer",
     "type": (zh_cn and "类别") or "Type",
     "unknown": (zh_cn and "未知") or "Unknown",
@@ -271,6 +311,7 @@ same_commands: List[str] = ["copy", "same"]
 search_commands: List[str] = ["find", "s", "search"]
 all_commands: List[str] = add_commands + list_commands + remove_commands + same_commands + search_commands
 all_commands += [
+    "benchmark",
     "captcha",
     "check",
     "comment",
@@ -287,11 +328,18 @@ all_commands += [
     "push",
     "regex",
     "reset",
+    "slow",
     "t2t",
     "version",
     "who"
 ]
 
+bits: Dict[str, int] = {
+    "nocr": 1,
+    "temp": 2,
+    "forever": 4
+}
+
 contains: Dict[str, Set[str]] = {
     "con": {"iml", "pho"},
     "nm": {"bio"},
@@ -299,21 +347,23 @@ contains: Dict[str, Set[str]] = {
     "wd": {"adi", "con", "spe", "tgp"}
 }
 
-default_word_status: Dict[str, Union[float, int]] = {
-    "time": int(time()),
-    "average": 0.0,
-    "today": 0,
-    "total": 0,
-    "temp": 0,
-    "who": 0
-}
-
-locks: Dict[str, Lock] = {
+locks: Dict[str, Union[Lock, RLock]] = {
+    "cache": Lock(),
+    "cost": Lock(),
+    "journal": Lock(),
     "receive": Lock(),
-    "regex": Lock(),
+    "regex": RLock(),
+    "save": Lock(),
+    "store": Lock(),
     "test": Lock()
 }
 
+measurer: Optional[Connection] = None
+
+pool: Optional[Pool] = None
+
+writer: bool = False
+
 receivers: Dict[str, List[str]] = {
     "ad": ["AVATAR", "CAPTCHA", "CLEAN", "LANG", "LONG", "NOPORN", "NOSPAM", "RECHECK", "TIP", "WATCH"],
     "ava": ["NOSPAM"],
@@ -372,19 +422,44 @@ regex: Dict[str, bool] = {
 for c in ascii_lowercase:
     regex[f"ad{c}"] = True
 
-result_search: Dict[str, Dict[str, Union[str, Dict[str, List[str]]]]] = {}
+result_list: Dict[str, Dict[str, Union[int, Tuple[str, ...]]]] = {}
+# result_list = {
+#     "type desc": {
+#         "time": 1512345678,
+#         "version": 1,
+#         "result": ("regex1", "regex2"),
+#         "per_page": 10
+#     }
+# }
+
+result_search: Dict[str, Dict[str, Union[int, str, Tuple[str, ...]]]] = {}
 # result_search = {
 #     "random": {
-#         "result": {
-#             "regex1": ["type1", "type2"]
-#         },
+#         "time": 1512345678,
+#         "result": ("regex1", "regex2"),
 #         "type": "type",
-#         "word": "regex"
+#         "word": "regex",
+#         "mode": "find"
 #     }
 # }
 
 sender: str = "REGEX"
 
+sessions: Dict[str, Dict[str, int]] = {
+    "ask_words": {
+        "limit": 256,
+        "ttl": 0
+    },
+    "result_list": {
+        "limit": 64,
+        "ttl": 3600
+    },
+    "result_search": {
+        "limit": 64,
+        "ttl": 3600
+    }
+}
+
 should_hide: bool = False
 
 sticker_titles: Dict[str, str] = {}
@@ -408,7 +483,7 @@ for path in ["data", "tmp"]:
 
 # Init data variables
 
-ask_words: Dict[str, Dict[str, Union[bool, int, str, List[str]]]] = {}
+ask_words: Dict[str, Dict[str, Union[bool, float, int, str, List[str]]]] = {}
 # ask_words = {
 #     "random": {
 #         "lock": False,
@@ -417,7 +492,8 @@ ask_words: Dict[str, Dict[str, Union[bool, int, str, List[str]]]] = {}
 #         "mid": 123,
 #         "new": "regex",
 #         "old": ["regex1", "regex2"],
-#         "type": "type"
+#         "type": "type",
+#         "cost": 0.0012
 #     }
 # }
 
@@ -426,10 +502,17 @@ comments: Dict[str, str] = {}
 #     "ada": "ADA"
 # }
 
+samples: Dict[str, Dict[str, List[str]]] = {}
+# samples = {
+#     "type": {
+#         "regex": ["regex", "regex", "regex"]
+#     }
+# }
+
 # Init word variables
 
 for word_type in regex:
-    locals()[f"{word_type}_words"]: Dict[str, Dict[str, Union[float, int]]] = {}
+    locals()[f"{word_type}_words"]: Dict[str, WordStatus] = {}
 
 # type_words = {
 #     "regex": {
@@ -438,15 +521,31 @@ for word_type in regex:
 #         "today": 3,
 #         "total": 20,
 #         "temp": 0,
-#         "who": 12345678
+#         "who": 12345678,
+#         "cost": 0.0012
 #     }
 # }
 
 # Load data
-file_list: List[str] = ["ask_words", "comments"]
+file_list: List[str] = ["ask_words", "comments", "samples"]
 file_list += [f"{f}_words" for f in regex]
 
+dirty: Set[str] = set()
+# dirty = {"type_words"}
+
+journals: Dict[str, int] = {}
+# journals = {
+#     "type_words": 12
+# }
+
+load_times: Dict[str, float] = {}
+# load_times = {
+#     "type_words": 0.012
+# }
+
 for file in file_list:
+    load_start = time()
+
     try:
         try:
             if exists(f"data/{file}") or exists(f"data/.{file}"):
@@ -464,6 +563,226 @@ for file in file_list:
         logger.critical(f"Load data {file} backup error: {e}", exc_info=True)
         raise SystemExit("[DATA CORRUPTION]")
 
+    # Replay the changes that are not compacted into the data file yet
+    journals[file] = 0
+
+    if exists(f"data/{file}.journal"):
+        with open(f"data/{file}.journal", "rb+") as f:
+            while True:
+                journal_position = f.tell()
+
+                try:
+                    journal_changes = pickle.load(f)
+                except EOFError:
+                    break
+                except Exception as e:
+                    logger.warning(f"Load journal {file} error: {e}")
+                    break
+
+                for journal_keys, journal_value in journal_changes.items():
+                    journal_keys = journal_keys if isinstance(journal_keys, tuple) else (journal_keys,)
+                    journal_data = locals()[f"{file}"]
+
+                    for journal_key in journal_keys[:-1]:
+                        journal_data = journal_data.setdefault(journal_key, {})
+
+                    if journal_value is None:
+                        journal_data.pop(journal_keys[-1], None)
+                    else:
+                        journal_data[journal_keys[-1]] = journal_value
+
+                journals[file] += len(journal_changes)
+
+            # Drop the record cut off by a crash, so the new records can be read again
+            f.truncate(journal_position)
+
+    # Keep the status of each word in a compact record
+    if file.endswith("_words") and file[:-6] in regex:
+        for word in locals()[f"{file}"]:
+            locals()[f"{file}"][word] = WordStatus(locals()[f"{file}"][word])
+
+    load_times[file] = time() - load_start
+    logger.info(f"Load data {file} in {load_times[file]:.3f}s")
+
+# Load the words from the database, the pickled words of a type are moved into it once
+database: Optional[sqlite3.Connection] = None
+
+if sqlite:
+    try:
+        database = sqlite3.connect("data/words.db", check_same_thread=False)
+        database.executescript("""
+            CREATE TABLE IF NOT EXISTS types (type TEXT PRIMARY KEY);
+            CREATE TABLE IF NOT EXISTS words (
+                type TEXT NOT NULL,
+                rule TEXT NOT NULL,
+                time INTEGER NOT NULL,
+                average REAL NOT NULL,
+                today INTEGER NOT NULL,
+                total INTEGER NOT NULL,
+                temp INTEGER NOT NULL,
+                who INTEGER NOT NULL,
+                cost REAL NOT NULL,
+                PRIMARY KEY (type, rule)
+            );
+            CREATE INDEX IF NOT EXISTS words_time ON words (type, time);
+            CREATE INDEX IF NOT EXISTS words_average ON words (type, average);
+            CREATE INDEX IF NOT EXISTS words_today ON words (type, today);
+            CREATE INDEX IF NOT EXISTS words_total ON words (type, total);
+            CREATE INDEX IF NOT EXISTS words_temp ON words (type, temp);
+            CREATE INDEX IF NOT EXISTS words_who ON words (who);
+        """)
+        database_types = {row[0] for row in database.execute("SELECT type FROM types")}
+
+        for word_type in regex:
+            load_start = time()
+            database_words = locals()[f"{word_type}_words"]
+
+            if word_type in database_types:
+                database_words.clear()
+
+                for database_row in database.execute("SELECT * FROM words WHERE type = ?", (word_type,)):
+                    database_words[database_row[1]] = WordStatus(dict(zip(default_word_status, database_row[2:])))
+            else:
+                with database:
+                    database.executemany(
+                        "INSERT OR REPLACE INTO words VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        [(word_type, word, *[database_words[word].get(c, default_word_status[c])
+                                             for c in default_word_status])
+                         for word in database_words]
+                    )
+                    database.execute("INSERT INTO types VALUES (?)", (word_type,))
+
+            load_times[f"{word_type}_words"] += time() - load_start
+            logger.info(f"Load database {word_type} in {time() - load_start:.3f}s")
+    except Exception as e:
+        logger.critical(f"Load database error: {e}", exc_info=True)
+        raise SystemExit("[DATA CORRUPTION]")
+
+# Compile the patterns
+automatons: Dict[str, Dict[str, Union[int, list]]] = {}
+# automatons = {
+#     "type": {
+#         "version": 1,
+#         "goto": [{"a": 1}, {}],
+#         "fail": [0, 0],
+#         "link": [0, 0],
+#         "output": [[], ["a+"]],
+#         "always": ["\\d+"]
+#     }
+# }
+
+backends: Dict[str, Dict[str, str]] = {}
+# backends = {
+#     "type": {
+#         "regex": "re2",
+#         "(a)\\1": "re"
+#     }
+# }
+
+cache: Dict[Tuple[str, str, int], List[str]] = OrderedDict()
+# cache = OrderedDict({
+#     ("type", "md5", 1): ["regex1", "regex2"]
+# })
+
+cache_stats: Dict[str, int] = {
+    "hits": 0,
+    "misses": 0
+}
+
+combined: Dict[str, Dict[str, Union[int, object, List[str]]]] = {}
+# combined = {
+#     "type": {
+#         "version": 1,
+#         "pattern": re2.Set,
+#         "words": ["regex1", "regex2"],
+#         "fallback": ["(a)\\1", "(b)\\1(?# nocr)"],
+#         "ocr_fallback": ["(a)\\1"]
+#     }
+# }
+
+compiled: Dict[str, Dict[str, Optional[Pattern]]] = {}
+# compiled = {
+#     "type": {
+#         "regex": re.compile("regex", re.I | re.M | re.S),
+#         "regex_not_used_yet": None
+#     }
+# }
+
+flags: Dict[str, Dict[str, int]] = {}
+# flags = {
+#     "type": {
+#         "regex(?# nocr)(?# temp)": 3
+#     }
+# }
+
+linear: Dict[str, Dict[str, str]] = {}
+# linear = {
+#     "type": {
+#         "regex": "(?ims)regex",
+#         "(a)\\1": ""
+#     }
+# }
+
+literals: Dict[str, Dict[str, Set[str]]] = {}
+# literals = {
+#     "type": {
+#         "(foo|bar)baz": {"baz"},
+#         "foo|bar": {"foo", "bar"}
+#     }
+# }
+
+profiles: Dict[str, Dict[str, Dict[str, Union[float, int]]]] = {}
+# profiles = {
+#     "type": {
+#         "regex": {
+#             "count": 3,
+#             "total": 0.0123,
+#             "worst": 0.01
+#         }
+#     }
+# }
+
+rule_types: Dict[str, Set[str]] = {}
+# rule_types = {
+#     "regex": {"ad", "ban"}
+# }
+
+stats: Dict[str, int] = {}
+# stats = {
+#     "type": 1
+# }
+
+trigrams: Optional[Dict[str, Set[str]]] = None
+# trigrams = {
+#     "reg": {"regex", "(?# temp)regex"}
+# }
+
+versions: Dict[str, int] = {}
+# versions = {
+#     "type": 1
+# }
+
+for word_type in regex:
+    backends[word_type] = {}
+    compiled[word_type] = {}
+    flags[word_type] = {}
+    linear[word_type] = {}
+    literals[word_type] = {}
+    profiles[word_type] = {}
+    samples[word_type] = samples.get(word_type, {})
+    stats[word_type] = 0
+    versions[word_type] = 0
+
+    # The rules are compiled on first use or by the prefetch after the client starts
+    for rule in locals()[f"{word_type}_words"]:
+        rule_types.setdefault(rule, set()).add(word_type)
+        compiled[word_type][rule] = None
+
+    # Drop the sample banks of the removed rules
+    for rule in list(samples[word_type]):
+        if rule not in locals()[f"{word_type}_words"]:
+            samples[word_type].pop(rule, None)
+
 # Generate special characters dictionary
 for special in ["spc", "spe"]:
     locals()[f"{special}_dict"]: Dict[str, str] = {}
@@ -487,3 +806,5 @@ for special in ["spc", "spe"]:
 copyright_text = (f"SCP-079-{sender} v{version}, Copyright (C) 2019-2020 SCP-079 <https://scp-079.org>\n"
                   "Licensed under the terms of the GNU General Public License v3 or later (GPLv3+)\n")
 print(copyright_text)
+print(f"Loaded {len(load_times)} data files in {sum(load_times.values()):.3f}s, "
+      f"the slowest is {max(load_times, key=load_times.get)} in {max(load_times.values()):.3f}s\n")
@@ -25,6 +25,7 @@ from .. import glovar
 from ..functions.etc import get_now, lang, mention_id, thread
 from ..functions.filters import regex_group
 from ..functions.words import cc, get_admin, get_desc, words_ask, words_list_page, words_search_page
+from ..functions.words import words_slow_page
 from ..functions.telegram import answer_callback, edit_message_reply_markup, edit_message_text
 
 # Enable logging
@@ -85,6 +86,13 @@ def answer(client: Client, callback_query: CallbackQuery) -> bool:
             text, markup = words_search_page(uid, key, page)
             edit_message_text(client, cid, mid, text, markup)
 
+        # List the slow words
+        elif action == "slow":
+            word_type = action_type
+            page = data
+            text, markup = words_slow_page(uid, word_type, page)
+            edit_message_text(client, cid, mid, text, markup)
+
         thread(answer_callback, (client, callback_query.id, ""))
 
         return True
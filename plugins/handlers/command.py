@@ -18,7 +18,6 @@
 
 import logging
 import re
-from copy import deepcopy
 from string import ascii_lowercase
 from subprocess import run, PIPE
 
@@ -26,16 +25,20 @@ from pyrogram import Client, Filters, Message
 
 from .. import glovar
 from ..functions.channel import share_data, share_regex_update
+from ..functions.engine import get_benchmark, get_combined, get_samples
 from ..functions.etc import code, code_block, general_link, get_callback_data, get_command_context, get_command_type
 from ..functions.etc import get_filename, get_forward_name, get_int, get_readable_time, get_text, italic, lang
 from ..functions.etc import mention_id, message_link, thread
 from ..functions.file import save
 from ..functions.filters import from_user, regex_group, test_group
 from ..functions.group import get_message
+from ..functions.status import WordStatus
+from ..functions.store import reset_stored_words
 from ..functions.telegram import edit_message_text, send_message
 from ..functions.tests import name_test, sticker_test, text_test
 from ..functions.words import cc, get_admin, get_desc, get_match, get_same_types, same_word, word_add, words_ask
 from ..functions.words import words_list, words_list_page, word_remove, words_search, words_search_page
+from ..functions.words import words_slow, words_slow_page
 
 # Enable logging
 logger = logging.getLogger(__name__)
@@ -45,8 +48,7 @@ logger = logging.getLogger(__name__)
                    & regex_group
                    & from_user)
 def add_word(client: Client, message: Message) -> bool:
-    # Add a new word
-    glovar.locks["regex"].acquire()
+    # Add a new word, the regex lock is only held by word_add for the insertion
     try:
         # Basic data
         cid = message.chat.id
@@ -74,8 +76,6 @@ def add_word(client: Client, message: Message) -> bool:
         return True
     except Exception as e:
         logger.warning(f"Add word error: {e}", exc_info=True)
-    finally:
-        glovar.locks["regex"].release()
 
     return False
 
@@ -141,6 +141,56 @@ def ask_word(client: Client, message: Message) -> bool:
     return False
 
 
+@Client.on_message(Filters.incoming & Filters.group & Filters.command(["benchmark"], glovar.prefix)
+                   & regex_group
+                   & from_user)
+def benchmark(client: Client, message: Message) -> bool:
+    # Compare the backends
+    try:
+        # Basic data
+        cid = message.chat.id
+        aid = message.from_user.id
+        mid = message.message_id
+
+        # Text prefix
+        text = (f"{lang('admin')}{lang('colon')}{mention_id(aid)}\n"
+                f"{lang('action')}{lang('colon')}{code(lang('action_benchmark'))}\n")
+
+        # Proceed
+        word_type = get_command_type(message)
+
+        if word_type in glovar.regex:
+            texts = get_samples(word_type)
+            result = get_benchmark(word_type, texts)
+            re_count = result.get("re", 0)
+            re2_count = result.get("re2", 0)
+            re_time = round(result.get("re_time", 0.0) * 1000, 2)
+            re2_time = round(result.get("re2_time", 0.0) * 1000, 2)
+
+            text += f"{lang('type')}{lang('colon')}{code(lang(word_type))}\n"
+
+            if glovar.comments.get(word_type):
+                text += f"{lang('comment')}{lang('colon')}{code(glovar.comments[word_type])}\n"
+
+            text += (f"{lang('backend')}{lang('colon')}{code(f're2 {re2_count} / re {re_count}')}\n"
+                     f"{lang('query')}{lang('colon')}{code(len(texts))}\n"
+                     f"{lang('cost')}{lang('colon')}{code(f're {re_time} ms / re2 {re2_time} ms')}\n"
+                     f"{lang('mismatches')}{lang('colon')}{code(result.get('mismatches', 0))}\n")
+        else:
+            text += (f"{lang('type')}{lang('colon')}{code(word_type or lang('unknown'))}\n"
+                     f"{lang('status')}{lang('colon')}{code(lang('status_failed'))}\n"
+                     f"{lang('reason')}{lang('colon')}{code(lang('command_usage'))}\n")
+
+        # Send the report message
+        thread(send_message, (client, cid, text, mid))
+
+        return True
+    except Exception as e:
+        logger.warning(f"Benchmark error: {e}", exc_info=True)
+
+    return False
+
+
 @Client.on_message(Filters.incoming & Filters.group & Filters.command(["captcha"], glovar.prefix)
                    & regex_group
                    & from_user)
@@ -219,6 +269,11 @@ def check(client: Client, message: Message) -> bool:
             else:
                 text += (f"{lang('status')}{lang('colon')}{code(lang('status_failed'))}\n"
                          f"{lang('reason')}{lang('colon')}{code(lang('reason_not_exist'))}\n")
+
+                word_types = [w_t for w_t in glovar.regex if w_t in glovar.rule_types.get(word, set())]
+
+                if word_types:
+                    text += f"{lang('found_in')}{lang('colon')}{code(lang('comma').join(map(lang, word_types)))}\n"
         else:
             text += (f"{lang('type')}{lang('colon')}{code(word_type or lang('unknown'))}\n"
                      f"{lang('status')}{lang('colon')}{code(lang('status_failed'))}\n"
@@ -451,7 +506,7 @@ def page_command(client: Client, message: Message) -> bool:
                 callback_data_list = get_callback_data(r_message)
                 i = (lambda x: 0 if x == "previous" else -1)(the_type)
 
-                if callback_data_list and callback_data_list[i]["a"] in {"list", "search"}:
+                if callback_data_list and callback_data_list[i]["a"] in {"list", "search", "slow"}:
                     action = callback_data_list[i]["a"]
                     action_type = callback_data_list[i]["t"]
                     page = callback_data_list[i]["d"]
@@ -459,6 +514,8 @@ def page_command(client: Client, message: Message) -> bool:
                     if action == "list":
                         desc = get_desc(r_message)
                         page_text, markup = words_list_page(uid, action_type, page, desc)
+                    elif action == "slow":
+                        page_text, markup = words_slow_page(uid, action_type, page)
                     else:
                         key = action_type
                         page_text, markup = words_search_page(uid, key, page)
@@ -657,9 +714,16 @@ def reset_words(client: Client, message: Message) -> bool:
 
         if command_type in glovar.regex:
             for word in list(eval(f"glovar.{command_type}_words")):
-                eval(f"glovar.{command_type}_words")[word] = deepcopy(glovar.default_word_status)
+                cost = eval(f"glovar.{command_type}_words")[word].get("cost", 0.0)
+                eval(f"glovar.{command_type}_words")[word] = WordStatus(glovar.default_word_status)
+                eval(f"glovar.{command_type}_words")[word]["cost"] = cost
 
-            save(f"{command_type}_words")
+            glovar.stats[command_type] += 1
+
+            if glovar.database:
+                reset_stored_words(command_type)
+            else:
+                save(f"{command_type}_words")
 
             text += f"{lang('type')}{lang('colon')}{code(lang(command_type))}\n"
 
@@ -670,9 +734,17 @@ def reset_words(client: Client, message: Message) -> bool:
         elif command_type == "all":
             for word_type in glovar.regex:
                 for word in list(eval(f"glovar.{word_type}_words")):
-                    eval(f"glovar.{word_type}_words")[word] = deepcopy(glovar.default_word_status)
+                    cost = eval(f"glovar.{word_type}_words")[word].get("cost", 0.0)
+                    eval(f"glovar.{word_type}_words")[word] = WordStatus(glovar.default_word_status)
+                    eval(f"glovar.{word_type}_words")[word]["cost"] = cost
 
-                save(f"{word_type}_words")
+                glovar.stats[word_type] += 1
+
+                if not glovar.database:
+                    save(f"{word_type}_words")
+
+            if glovar.database:
+                reset_stored_words()
 
             text += (f"{lang('type')}{lang('colon')}{code(lang('all'))}\n"
                      f"{lang('status')}{lang('colon')}{code(lang('status_succeeded'))}\n")
@@ -808,6 +880,27 @@ def search_words(client: Client, message: Message) -> bool:
     return False
 
 
+@Client.on_message(Filters.incoming & Filters.group & Filters.command(["slow"], glovar.prefix)
+                   & regex_group
+                   & from_user)
+def slow_words(client: Client, message: Message) -> bool:
+    # List the slowest words
+    try:
+        # Basic data
+        cid = message.chat.id
+        mid = message.message_id
+
+        # Send the report message
+        text, markup = words_slow(message)
+        thread(send_message, (client, cid, text, mid, markup))
+
+        return True
+    except Exception as e:
+        logger.warning(f"Slow words error: {e}", exc_info=True)
+
+    return False
+
+
 @Client.on_message(Filters.incoming & Filters.group & Filters.command(["t2t"], glovar.prefix)
                    & test_group
                    & from_user)
@@ -929,6 +1022,12 @@ def version(client: Client, message: Message) -> bool:
                 f"{lang('提交时间')}{lang('colon')}{code(git_date)}\n"
                 f"{lang('命令发送时间')}{lang('colon')}{code(command_date)}\n")
 
+        # Result cache info
+        if glovar.limit_cache:
+            text += (f"{lang('cache')}{lang('colon')}{code(f'{len(glovar.cache)} / {glovar.limit_cache}')}\n"
+                     f"{lang('cache_hits')}{lang('colon')}{code(glovar.cache_stats['hits'])}\n"
+                     f"{lang('cache_misses')}{lang('colon')}{code(glovar.cache_stats['misses'])}\n")
+
         # Send the report message
         result = send_message(client, cid, text, mid)
     except Exception as e:
@@ -970,9 +1069,21 @@ def who(client: Client, message: Message) -> bool:
                 uid = words[word].get("who", 0)
                 text += (f"{lang('status')}{lang('colon')}{code(lang('status_succeeded'))}\n"
                          f"{lang('result')}{lang('colon')}{code(uid)}\n")
+
+                if "cost" in words[word]:
+                    cost = words[word]["cost"]
+                    text += f"{lang('cost')}{lang('colon')}{code(f'{cost:.4f}s')}\n"
+
+                get_combined(word_type)
+                text += f"{lang('backend')}{lang('colon')}{code(glovar.backends[word_type].get(word, 're'))}\n"
             else:
                 text += (f"{lang('status')}{lang('colon')}{code(lang('status_failed'))}\n"
                          f"{lang('reason')}{lang('colon')}{code(lang('reason_not_exist'))}\n")
+
+                word_types = [w_t for w_t in glovar.regex if w_t in glovar.rule_types.get(word, set())]
+
+                if word_types:
+                    text += f"{lang('found_in')}{lang('colon')}{code(lang('comma').join(map(lang, word_types)))}\n"
         else:
             text += (f"{lang('type')}{lang('colon')}{code(word_type or lang('unknown'))}\n"
                      f"{lang('status')}{lang('colon')}{code(lang('status_failed'))}\n"